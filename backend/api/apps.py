@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from api.signals import (connect_auth_signals,
+                                 connect_catalog_signals,
+                                 connect_relation_signals)
+        connect_auth_signals()
+        connect_catalog_signals()
+        connect_relation_signals()
@@ -0,0 +1,144 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.db.models import prefetch_related_objects
+from django.urls import URLPattern
+from rest_framework.response import Response
+from rest_framework.routers import DefaultRouter
+
+
+def run_in_thread(func, *args, **kwargs):
+    def call():
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(call, thread_sensitive=False)()
+
+
+class AsyncViewSetMixin:
+    defer_prefetch = False
+
+    @classmethod
+    def as_async_view(cls, actions, **initkwargs):
+        actions = cls.as_view(actions, **initkwargs).actions
+
+        async def view(request, *args, **kwargs):
+            self = cls(**initkwargs)
+            if 'get' in actions and 'head' not in actions:
+                actions['head'] = actions['get']
+            self.action_map = actions
+            for method, action in actions.items():
+                setattr(self, method, getattr(self, action))
+            self.request = request
+            self.args = args
+            self.kwargs = kwargs
+            return await self.async_dispatch(request, *args, **kwargs)
+
+        view.cls = cls
+        view.initkwargs = initkwargs
+        view.actions = actions
+        view.csrf_exempt = True
+        return view
+
+    async def async_dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await run_in_thread(self.initial, request, *args, **kwargs)
+            method = request.method.lower()
+            handler = None
+            if method in self.http_method_names:
+                handler = getattr(self, method, None)
+            if handler is None:
+                handler = self.http_method_not_allowed
+            async_handler = getattr(self, f'async_{self.action}', None)
+            if async_handler is not None and method in ('get', 'head'):
+                response = await async_handler(request, *args, **kwargs)
+            else:
+                response = await run_in_thread(handler, request,
+                                               *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = await run_in_thread(self.finalize, request, response,
+                                            *args, **kwargs)
+        return self.response
+
+    def finalize(self, request, response, *args, **kwargs):
+        # Renderers may query the database (the browsable API builds forms)
+        # and large pages take a while to encode, so both stay off the loop.
+        response = self.finalize_response(request, response, *args, **kwargs)
+        if not response.streaming and not getattr(response, 'is_rendered',
+                                                  True):
+            response.render()
+        return response
+
+    def is_cacheable(self, request):
+        return False
+
+    def get_prefetch_lookups(self):
+        return ()
+
+    async def prefetch(self, objects):
+        lookups = self.get_prefetch_lookups()
+        if not objects or not lookups:
+            return
+        # Lookups run in parallel threads and write into the same instances,
+        # so the shared prefetch cache has to exist before they start.
+        for instance in objects:
+            if not hasattr(instance, '_prefetched_objects_cache'):
+                instance._prefetched_objects_cache = {}
+        await asyncio.gather(*(
+            run_in_thread(prefetch_related_objects, objects, lookup)
+            for lookup in lookups
+        ))
+
+    async def async_list(self, request, *args, **kwargs):
+        if self.is_cacheable(request):
+            return await run_in_thread(self.list, request, *args, **kwargs)
+        self.defer_prefetch = True
+
+        def load_page():
+            queryset = self.filter_queryset(self.get_queryset())
+            return self.paginate_queryset(queryset), queryset
+
+        page, queryset = await run_in_thread(load_page)
+        objects = page if page is not None else await run_in_thread(
+            list, queryset
+        )
+        await self.prefetch(objects)
+        serializer = self.get_serializer(objects, many=True)
+        data = await run_in_thread(getattr, serializer, 'data')
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    async def async_retrieve(self, request, *args, **kwargs):
+        if self.is_cacheable(request):
+            return await run_in_thread(self.retrieve,
+                                       request, *args, **kwargs)
+        self.defer_prefetch = True
+        instance = await run_in_thread(self.get_object)
+        await self.prefetch([instance])
+        serializer = self.get_serializer(instance)
+        return Response(await run_in_thread(getattr, serializer, 'data'))
+
+
+class AsyncRouter(DefaultRouter):
+    def get_urls(self):
+        return [self.make_async(url) for url in super().get_urls()]
+
+    def make_async(self, url):
+        view = getattr(url, 'callback', None)
+        cls = getattr(view, 'cls', None)
+        if cls is None or not issubclass(cls, AsyncViewSetMixin):
+            return url
+        return URLPattern(url.pattern,
+                          cls.as_async_view(view.actions, **view.initkwargs),
+                          url.default_args, url.name)
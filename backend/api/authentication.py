@@ -0,0 +1,78 @@
+import hashlib
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import SAFE_METHODS
+
+from foodgram.cache import is_shared
+
+SIGNED_TOKEN_SALT = 'api.authentication.token'
+
+
+def get_cache_key(key):
+    digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+    return f'api:auth:token:{digest}'
+
+
+def get_signer():
+    return signing.TimestampSigner(salt=SIGNED_TOKEN_SALT)
+
+
+def sign_token(key):
+    return get_signer().sign(key)
+
+
+def unsign_token(value):
+    try:
+        return get_signer().unsign(
+            value, max_age=settings.AUTH_SIGNED_TOKEN_MAX_AGE or None
+        )
+    except signing.BadSignature:
+        raise AuthenticationFailed(_('Invalid token.'))
+
+
+def forget_token(key):
+    transaction.on_commit(lambda: cache.delete(get_cache_key(key)))
+
+
+def invalidate_token(instance, **kwargs):
+    forget_token(instance.key)
+
+
+def invalidate_user_tokens(instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    for key in Token.objects.filter(user_id=instance.pk).values_list(
+            'key', flat=True):
+        forget_token(key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    use_cache = True
+
+    def authenticate(self, request):
+        # Logout, password change and deactivation can only reach the
+        # cached token of other workers through a shared cache.
+        self.use_cache = request.method in SAFE_METHODS and is_shared()
+        return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        if ':' in key:
+            key = unsign_token(key)
+        if not self.use_cache:
+            return super().authenticate_credentials(key)
+        cache_key = get_cache_key(key)
+        token = cache.get(cache_key)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(cache_key, token, settings.AUTH_TOKEN_CACHE_TIMEOUT)
+            return user, token
+        if not token.user.is_active:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        return token.user, token
@@ -0,0 +1,85 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from foodgram.cache import get_catalog_version
+
+
+class CatalogCacheMixin:
+    cached_actions = ('list', 'retrieve')
+    cache_anonymous_only = False
+
+    def is_cacheable(self, request):
+        return (request.method in ('GET', 'HEAD')
+                and self.action in self.cached_actions
+                and not (self.cache_anonymous_only
+                         and request.user.is_authenticated))
+
+    def get_cache_key(self, request, version):
+        path = hashlib.md5(
+            request.get_full_path().encode('utf-8')
+        ).hexdigest()
+        return (f'api:catalog:{version}:'
+                f'{request.accepted_renderer.format}:{path}')
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if not self.is_cacheable(request):
+            return handler(request, *args, **kwargs)
+        version = get_catalog_version()
+        key = self.get_cache_key(request, version)
+        entry = cache.get(key)
+        if entry is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            response.accepted_renderer = request.accepted_renderer
+            response.accepted_media_type = request.accepted_media_type
+            response.renderer_context = self.get_renderer_context()
+            response.render()
+            entry = {
+                'content': response.content,
+                'content_type': response['Content-Type'],
+                'etag': hashlib.md5(response.content).hexdigest(),
+                'last_modified': int(version),
+            }
+            cache.set(key, entry, settings.CATALOG_CACHE_TIMEOUT)
+        response = HttpResponse(entry['content'],
+                                content_type=entry['content_type'])
+        response['ETag'] = quote_etag(entry['etag'])
+        response['Last-Modified'] = http_date(entry['last_modified'])
+        patch_vary_headers(response, ('Authorization',))
+        return get_conditional_response(
+            request,
+            etag=response['ETag'],
+            last_modified=entry['last_modified'],
+            response=response,
+        )
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve,
+                                    request, *args, **kwargs)
+
+
+class ConditionalResponseMixin:
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response,
+                                             *args, **kwargs)
+        if (request.method not in ('GET', 'HEAD')
+                or response.status_code != 200
+                or response.streaming
+                or response.has_header('ETag')):
+            return response
+        response.render()
+        response['ETag'] = quote_etag(
+            hashlib.md5(response.content).hexdigest()
+        )
+        patch_vary_headers(response, ('Authorization',))
+        return get_conditional_response(request, etag=response['ETag'],
+                                        response=response)
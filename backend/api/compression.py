@@ -0,0 +1,112 @@
+import asyncio
+import gzip
+import re
+
+from asgiref.sync import markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/')
+
+ENCODING_RE = re.compile(r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?')
+
+
+def compress_gzip(content):
+    return gzip.compress(content, compresslevel=6, mtime=0)
+
+
+def compress_brotli(content):
+    return brotli.compress(content, quality=5)
+
+
+ENCODERS = {'gzip': compress_gzip}
+if brotli is not None:
+    ENCODERS = {'br': compress_brotli, **ENCODERS}
+
+
+def accepted_encodings(header):
+    accepted = {}
+    for part in header.lower().split(','):
+        match = ENCODING_RE.match(part)
+        if match is None:
+            continue
+        encoding, quality = match.groups()
+        try:
+            accepted[encoding] = float(quality) if quality else 1
+        except ValueError:
+            continue
+    return accepted
+
+
+def choose_encoding(request, streaming):
+    accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    for encoding in ENCODERS:
+        if streaming and encoding != 'gzip':
+            continue
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def weaken_etag(response):
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+        response['ETag'] = f'W/{etag}'
+
+
+def is_compressible(response):
+    content_type = response.get('Content-Type', '')
+    return (response.status_code == 200
+            and not response.has_header('Content-Encoding')
+            and 'no-transform' not in response.get('Cache-Control', '')
+            and content_type.startswith(COMPRESSIBLE_TYPES))
+
+
+def compress_response(request, response):
+    if not is_compressible(response):
+        return response
+    if not response.streaming and (
+            len(response.content) < settings.COMPRESSION_MIN_SIZE):
+        return response
+    patch_vary_headers(response, ('Accept-Encoding',))
+    encoding = choose_encoding(request, response.streaming)
+    if encoding is None:
+        return response
+    if response.streaming:
+        response.streaming_content = compress_sequence(
+            response.streaming_content
+        )
+        del response['Content-Length']
+    else:
+        compressed = ENCODERS[encoding](response.content)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+    weaken_etag(response)
+    response['Content-Encoding'] = encoding
+    return response
+
+
+class CompressionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        return compress_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return compress_response(request, await self.get_response(request))
@@ -1,11 +1,23 @@
 from django_filters.rest_framework import FilterSet, filters
 from recipes.models import Recipe, Tag
-from rest_framework.filters import SearchFilter
+from rest_framework.filters import BaseFilterBackend
 
+from api.search import (filter_by_ingredients, search_ingredients,
+                        search_recipes)
 
-class IngredientSearchFilter(SearchFilter):
+
+class IngredientSearchFilter(BaseFilterBackend):
     search_param = 'name'
 
+    def filter_queryset(self, request, queryset, view):
+        return search_ingredients(
+            queryset, request.query_params.get(self.search_param, '')
+        )
+
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    pass
+
 
 class RecipeFilter(FilterSet):
     tags = filters.ModelMultipleChoiceFilter(
@@ -21,17 +33,30 @@ class RecipeFilter(FilterSet):
         field_name='is_in_shopping_cart',
         method='filter_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='filter_search')
+    ingredients = NumberInFilter(method='filter_ingredients')
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart',
+                  'search', 'ingredients')
 
     def filter_is_favorited(self, queryset, name, value):
-        if value:
-            return queryset.filter(favourite__user=self.request.user)
-        return queryset
+        if not value:
+            return queryset
+        if self.request.user.is_anonymous:
+            return queryset.none()
+        return queryset.filter(favourite__user=self.request.user)
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
-        if value:
-            return queryset.filter(shopping_cart__user=self.request.user)
-        return queryset
+        if not value:
+            return queryset
+        if self.request.user.is_anonymous:
+            return queryset.none()
+        return queryset.filter(shopping_cart__user=self.request.user)
+
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def filter_ingredients(self, queryset, name, value):
+        return filter_by_ingredients(queryset, map(int, value))
@@ -0,0 +1,328 @@
+import asyncio
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from functools import lru_cache
+
+from asgiref.sync import markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from foodgram.connections import connection_stats
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'ENABLED': True,
+    'QUERY_BUDGET': 20,
+    'LATENCY_BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+    'QUERY_BUCKETS': (1, 2, 5, 10, 20, 50, 100),
+    'SIZE_BUCKETS': (1024, 4096, 16384, 65536, 262144, 1048576),
+}
+
+DB_METRICS = (
+    ('conn_max_age', 'gauge', 'Время жизни постоянного соединения'),
+    ('connects', 'counter', 'Открытия соединений с БД'),
+    ('health_check_failures', 'counter',
+     'Соединения, не прошедшие проверку перед запросом'),
+    ('pool_max_size', 'gauge', 'Максимальный размер пула'),
+    ('pool_open', 'gauge', 'Открытые соединения пула'),
+    ('pool_idle', 'gauge', 'Свободные соединения пула'),
+    ('pool_used', 'gauge', 'Занятые соединения пула'),
+    ('pool_opened', 'counter', 'Новые физические соединения пула'),
+    ('pool_discarded', 'counter', 'Закрытые пулом соединения'),
+    ('pool_timeouts', 'counter', 'Отказы по таймауту ожидания пула'),
+)
+
+current_stats = ContextVar('request_stats', default=None)
+
+
+def get_setting(name):
+    return getattr(settings, 'REQUEST_METRICS', {}).get(
+        name, DEFAULT_SETTINGS[name]
+    )
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    histograms = (
+        ('request_duration_seconds', 'LATENCY_BUCKETS',
+         'Время обработки запроса'),
+        ('request_queries', 'QUERY_BUCKETS',
+         'Количество SQL-запросов на запрос'),
+        ('request_query_duration_seconds', 'LATENCY_BUCKETS',
+         'Время выполнения SQL-запросов'),
+        ('serializer_duration_seconds', 'LATENCY_BUCKETS',
+         'Время сериализации ответа'),
+        ('response_size_bytes', 'SIZE_BUCKETS',
+         'Размер тела ответа'),
+    )
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {name: setting for name, setting, _ in self.histograms}
+        self.reset()
+
+    def reset(self):
+        self.requests = {}
+        self.budget_exceeded = {}
+        self.series = {name: {} for name, _, _ in self.histograms}
+
+    def observe(self, name, labels, value):
+        series = self.series[name]
+        if labels not in series:
+            series[labels] = Histogram(get_setting(self.buckets[name]))
+        series[labels].observe(value)
+
+    def record(self, view, method, status, stats, size):
+        labels = (view, method)
+        with self.lock:
+            key = labels + (str(status),)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.observe('request_duration_seconds', labels, stats.duration)
+            self.observe('request_queries', labels, stats.queries)
+            self.observe('request_query_duration_seconds', labels,
+                         stats.query_time)
+            self.observe('serializer_duration_seconds', labels,
+                         stats.serializer_time)
+            self.observe('response_size_bytes', labels, size)
+            if stats.queries > get_setting('QUERY_BUDGET'):
+                self.budget_exceeded[labels] = (
+                    self.budget_exceeded.get(labels, 0) + 1
+                )
+
+    def render(self):
+        lines = []
+        with self.lock:
+            lines += [
+                '# HELP foodgram_requests_total Количество запросов',
+                '# TYPE foodgram_requests_total counter',
+            ]
+            for (view, method, status), value in sorted(
+                    self.requests.items()):
+                lines.append(
+                    f'foodgram_requests_total{{view="{view}",'
+                    f'method="{method}",status="{status}"}} {value}'
+                )
+            lines += [
+                '# HELP foodgram_query_budget_exceeded_total Запросы '
+                'сверх бюджета SQL-запросов',
+                '# TYPE foodgram_query_budget_exceeded_total counter',
+            ]
+            for (view, method), value in sorted(
+                    self.budget_exceeded.items()):
+                lines.append(
+                    f'foodgram_query_budget_exceeded_total{{view="{view}",'
+                    f'method="{method}"}} {value}'
+                )
+            for name, _, help_text in self.histograms:
+                metric = f'foodgram_{name}'
+                lines += [f'# HELP {metric} {help_text}',
+                          f'# TYPE {metric} histogram']
+                for (view, method), histogram in sorted(
+                        self.series[name].items()):
+                    labels = f'view="{view}",method="{method}"'
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets,
+                                            histogram.counts):
+                        cumulative += count
+                        lines.append(f'{metric}_bucket{{{labels},'
+                                     f'le="{bound}"}} {cumulative}')
+                    lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} '
+                                 f'{histogram.count}')
+                    lines.append(f'{metric}_sum{{{labels}}} '
+                                 f'{histogram.sum}')
+                    lines.append(f'{metric}_count{{{labels}}} '
+                                 f'{histogram.count}')
+        lines += self.render_connections()
+        return '\n'.join(lines) + '\n'
+
+    def render_connections(self):
+        lines = []
+        stats = connection_stats()
+        for name, metric_type, help_text in DB_METRICS:
+            metric = f'foodgram_db_{name}'
+            if metric_type == 'counter':
+                metric += '_total'
+            values = [(alias, alias_stats[name])
+                      for alias, alias_stats in sorted(stats.items())
+                      if name in alias_stats]
+            if not values:
+                continue
+            lines += [f'# HELP {metric} {help_text}',
+                      f'# TYPE {metric} {metric_type}']
+            lines += [f'{metric}{{alias="{alias}"}} {value}'
+                      for alias, value in values]
+        return lines
+
+
+registry = Registry()
+
+
+class RequestStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queries = 0
+        self.query_time = 0
+        self.serializer_time = 0
+        self.duration = 0
+
+    def add_query(self, duration):
+        with self.lock:
+            self.queries += 1
+            self.query_time += duration
+
+
+def record_query(execute, sql, params, many, context):
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_query(time.perf_counter() - start)
+
+
+def add_query_recorder(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def install_query_recorder():
+    connection_created.connect(add_query_recorder,
+                               dispatch_uid='api.metrics.record_query')
+    for connection in connections.all():
+        add_query_recorder(connection)
+
+
+class TimedRepresentationMixin:
+    def to_representation(self, instance):
+        stats = current_stats.get()
+        if stats is None:
+            return super().to_representation(instance)
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            stats.serializer_time += time.perf_counter() - start
+
+
+@lru_cache(maxsize=None)
+def timed_serializer(serializer_class):
+    return type(serializer_class)(
+        serializer_class.__name__,
+        (TimedRepresentationMixin, serializer_class),
+        {'__module__': serializer_class.__module__},
+    )
+
+
+class SerializerTimerMixin:
+    def get_serializer(self, *args, **kwargs):
+        serializer_class = self.get_serializer_class()
+        if get_setting('ENABLED'):
+            serializer_class = timed_serializer(serializer_class)
+        kwargs.setdefault('context', self.get_serializer_context())
+        return serializer_class(*args, **kwargs)
+
+
+def get_view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name or 'unnamed'
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not get_setting('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        install_query_recorder()
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.finish(request, response, stats, start)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.finish(request, response, stats, start)
+
+    def finish(self, request, response, stats, start):
+        if not response.streaming:
+            stats.duration = time.perf_counter() - start
+            self.record(request, response, stats, len(response.content))
+            return response
+        # The body of a streaming response is produced while the server
+        # iterates it, so its queries, size and duration are counted up to
+        # the moment the response is closed.
+        content = response.streaming_content
+        size = 0
+
+        def measured():
+            nonlocal size
+            iterator = iter(content)
+            while True:
+                token = current_stats.set(stats)
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    current_stats.reset(token)
+                size += len(chunk)
+                yield chunk
+
+        def close():
+            stats.duration = time.perf_counter() - start
+            self.record(request, response, stats, size)
+
+        response.streaming_content = measured()
+        response._resource_closers.append(close)
+        return response
+
+    def record(self, request, response, stats, size):
+        view = get_view_name(request)
+        registry.record(view, request.method, response.status_code,
+                        stats, size)
+        budget = get_setting('QUERY_BUDGET')
+        if stats.queries > budget:
+            logger.warning(
+                '%s %s (%s): %d SQL-запросов при бюджете %d',
+                request.method, request.path, view, stats.queries, budget
+            )
@@ -1,5 +1,149 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from foodgram.settings import MAX_PAGE_SIZE
+
+
+class KeysetPaginator(BasePagination):
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    invalid_cursor_message = 'Неверный курсор'
+
+    def __init__(self, ordering, page_size, max_page_size=None):
+        self.ordering = ordering
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        if self.max_page_size:
+            return min(page_size, self.max_page_size)
+        return page_size
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(b64decode(encoded.encode('ascii')))
+            position, reverse = cursor['p'], bool(cursor['r'])
+        except (BinasciiError, KeyError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or (
+                len(position) != len(self.ordering)):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, item, reverse):
+        position = [self.serialize_value(getattr(item, field.lstrip('-')))
+                    for field in self.ordering]
+        encoded = b64encode(json.dumps(
+            {'p': position, 'r': int(reverse)}
+        ).encode('ascii')).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded
+        )
+
+    def serialize_value(self, value):
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return value
+
+    def get_ordering(self, reverse):
+        if not reverse:
+            return self.ordering
+        return [field[1:] if field.startswith('-') else f'-{field}'
+                for field in self.ordering]
+
+    def get_position_filter(self, queryset, ordering, position):
+        values = [
+            queryset.model._meta.get_field(field.lstrip('-')).to_python(value)
+            for field, value in zip(ordering, position)
+        ]
+        after = Q()
+        for index, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition = Q(**{f'{name}__{lookup}': values[index]})
+            for previous, value in zip(ordering[:index], values):
+                condition &= Q(**{previous.lstrip('-'): value})
+            after |= condition
+        first = ordering[0].lstrip('-')
+        bound = 'lte' if ordering[0].startswith('-') else 'gte'
+        return Q(**{f'{first}__{bound}': values[0]}) & after
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+        ordering = self.get_ordering(reverse)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            try:
+                queryset = queryset.filter(
+                    self.get_position_filter(queryset, ordering, position)
+                )
+            except ValidationError:
+                raise NotFound(self.invalid_cursor_message)
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+        self.has_next = has_more if not reverse else position is not None
+        self.has_previous = position is not None if not reverse else has_more
+        self.page = results
+        return results
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
 
 
 class BasePaginator(PageNumberPagination):
     page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    max_page_size = MAX_PAGE_SIZE
+    keyset_ordering = None
+    keyset = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = self.keyset_ordering or getattr(
+            view, 'keyset_ordering', None
+        )
+        if ordering and self.cursor_query_param in request.query_params:
+            self.keyset = KeysetPaginator(ordering, self.page_size,
+                                          self.max_page_size)
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,29 @@
+import codecs
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def read_buffer(stream):
+    if hasattr(stream, 'getbuffer'):
+        return stream.getbuffer()
+    return stream.read()
+
+
+class FastJSONParser(JSONParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get(
+            'encoding', settings.DEFAULT_CHARSET
+        )
+        if orjson is None or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(read_buffer(stream))
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
@@ -0,0 +1,97 @@
+import time
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import CharField, Value
+
+from foodgram.cache import is_shared
+from recipes.models import Cart, Favourite, Follow
+
+
+class IdSet:
+    __slots__ = ('ids',)
+
+    def __init__(self, ids=()):
+        self.ids = array('q', sorted(ids))
+
+    def __contains__(self, value):
+        index = bisect_left(self.ids, value)
+        return index < len(self.ids) and self.ids[index] == value
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class Relations:
+    __slots__ = ('favourites', 'cart', 'following')
+
+    def __init__(self, favourites=(), cart=(), following=()):
+        self.favourites = IdSet(favourites)
+        self.cart = IdSet(cart)
+        self.following = IdSet(following)
+
+
+NO_RELATIONS = Relations()
+
+
+def get_version_key(user_id):
+    return f'api:relations:{user_id}:version'
+
+
+def get_relations_version(user_id):
+    return cache.get_or_set(get_version_key(user_id), time.time,
+                            timeout=None)
+
+
+def bump_relations_version(user_id):
+    cache.set(get_version_key(user_id), time.time(), timeout=None)
+
+
+def invalidate_relations(instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: bump_relations_version(user_id))
+
+
+def load_relations(user_id):
+    ids = {'favourites': [], 'cart': [], 'following': []}
+    rows = Favourite.objects.filter(user_id=user_id).values_list(
+        'recipe_id', Value('favourites', output_field=CharField())
+    ).union(
+        Cart.objects.filter(user_id=user_id).values_list(
+            'recipe_id', Value('cart', output_field=CharField())
+        ),
+        Follow.objects.filter(user_id=user_id).values_list(
+            'author_id', Value('following', output_field=CharField())
+        ),
+        all=True,
+    )
+    for pk, kind in rows:
+        ids[kind].append(pk)
+    return Relations(**ids)
+
+
+def load_cached_relations(user_id):
+    # Without a shared cache the sets are loaded once per request: another
+    # worker would not see the version bump and serve stale flags.
+    if not is_shared():
+        return load_relations(user_id)
+    version = get_relations_version(user_id)
+    key = f'api:relations:{user_id}:{version}'
+    relations = cache.get(key)
+    if relations is None:
+        relations = load_relations(user_id)
+        cache.set(key, relations, settings.RELATIONS_CACHE_TIMEOUT)
+    return relations
+
+
+def get_relations(request):
+    if request is None or request.user.is_anonymous:
+        return NO_RELATIONS
+    relations = getattr(request, 'relations', None)
+    if relations is None:
+        relations = load_cached_relations(request.user.id)
+        request.relations = relations
+    return relations
@@ -0,0 +1,34 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+encoder = JSONEncoder()
+
+LINE_SEPARATOR = '\u2028'.encode('utf-8')
+PARAGRAPH_SEPARATOR = '\u2029'.encode('utf-8')
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.get_indent(accepted_media_type,
+                                             renderer_context or {}):
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        if data is None:
+            return b''
+        try:
+            content = orjson.dumps(
+                data, default=encoder.default,
+                option=(orjson.OPT_PASSTHROUGH_DATETIME
+                        | orjson.OPT_NON_STR_KEYS),
+            )
+        except TypeError:
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        return content.replace(LINE_SEPARATOR, b'\\u2028').replace(
+            PARAGRAPH_SEPARATOR, b'\\u2029'
+        )
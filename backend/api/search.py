@@ -0,0 +1,156 @@
+import re
+from bisect import bisect_left
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import Case, Count, F, IntegerField, Q, Value, When
+from django.db.models.functions import Lower
+
+from foodgram.cache import get_catalog_version
+from recipes.models import IngredientsInRecipe
+from recipes.search import SEARCH_CONFIG
+
+PREFIX_RANK = 0
+SUBSTRING_RANK = 1
+TRIGRAM_RANK = 2
+
+# Default of pg_trgm.similarity_threshold, used by the `%` operator.
+TRIGRAM_THRESHOLD = 0.3
+
+# Shorter queries yield no trigrams, so they are matched by prefix only.
+MIN_FUZZY_LENGTH = 3
+
+WORD_RE = re.compile(r'\w+')
+
+
+def trigrams(value):
+    result = set()
+    for word in WORD_RE.findall(value.lower()):
+        padded = f'  {word} '
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def trigram_similarity(first, second):
+    first, second = trigrams(first), trigrams(second)
+    if not first or not second:
+        return 0
+    return len(first & second) / len(first | second)
+
+
+class PostgresIngredientSearch:
+    def search(self, queryset, query, limit):
+        queryset = queryset.annotate(lower_name=Lower('name'))
+        if len(query) < MIN_FUZZY_LENGTH:
+            return queryset.filter(
+                lower_name__startswith=query
+            ).order_by('lower_name', 'id')[:limit]
+        return queryset.filter(
+            Q(lower_name__contains=query)
+            | Q(lower_name__trigram_similar=query)
+        ).annotate(rank=Case(
+            When(lower_name__startswith=query, then=Value(PREFIX_RANK)),
+            When(lower_name__contains=query, then=Value(SUBSTRING_RANK)),
+            default=Value(TRIGRAM_RANK),
+            output_field=IntegerField(),
+        )).order_by('rank', 'lower_name', 'id')[:limit]
+
+
+class SortedArrayIngredientSearch:
+    def __init__(self):
+        # Version, names and ids are swapped in a single assignment, so a
+        # concurrent reader never pairs names with ids of another version.
+        self.index = (None, [], [])
+
+    def load(self, queryset):
+        version = get_catalog_version()
+        index = self.index
+        if version != index[0]:
+            rows = sorted(
+                (name.lower(), pk)
+                for pk, name in queryset.model.objects.values_list(
+                    'id', 'name'
+                )
+            )
+            index = (version,
+                     [name for name, _ in rows], [pk for _, pk in rows])
+            self.index = index
+        return index[1:]
+
+    def rank(self, names, ids, query, limit):
+        start = bisect_left(names, query)
+        end = bisect_left(names, query + '\uffff', lo=start)
+        found = list(range(start, min(end, start + limit)))
+        if len(query) < MIN_FUZZY_LENGTH:
+            return [ids[index] for index in found]
+        if len(found) < limit:
+            prefix = set(range(start, end))
+            found.extend(
+                index for index, name in enumerate(names)
+                if index not in prefix and query in name
+            )
+        if len(found) < limit:
+            seen = set(found)
+            found.extend(
+                index for index, name in enumerate(names)
+                if index not in seen
+                and trigram_similarity(name, query) >= TRIGRAM_THRESHOLD
+            )
+        return [ids[index] for index in found[:limit]]
+
+    def search(self, queryset, query, limit):
+        names, ids = self.load(queryset)
+        ids = self.rank(names, ids, query, limit)
+        if not ids:
+            return queryset.none()
+        return queryset.filter(id__in=ids).order_by(Case(
+            *(When(id=pk, then=Value(position))
+              for position, pk in enumerate(ids)),
+            output_field=IntegerField(),
+        ))
+
+
+postgres_search = PostgresIngredientSearch()
+sorted_array_search = SortedArrayIngredientSearch()
+
+
+def search_ingredients(queryset, query, limit=None):
+    query = query.strip().lower()
+    if not query:
+        return queryset
+    if limit is None:
+        limit = settings.INGREDIENT_SEARCH_LIMIT
+    if connection.vendor == 'postgresql':
+        return postgres_search.search(queryset, query, limit)
+    return sorted_array_search.search(queryset, query, limit)
+
+
+def search_recipes(queryset, query):
+    query = query.strip()
+    if not query:
+        return queryset
+    if connection.vendor == 'postgresql':
+        search_query = SearchQuery(query, config=SEARCH_CONFIG,
+                                   search_type='websearch')
+        return queryset.filter(search_vector=search_query).annotate(
+            rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-rank', '-pub_date', '-id')
+    return queryset.filter(id__in=queryset.model.objects.filter(
+        Q(name__icontains=query)
+        | Q(text__icontains=query)
+        | Q(ingredient__name__icontains=query)
+    ).values('id'))
+
+
+def filter_by_ingredients(queryset, ingredient_ids):
+    ingredient_ids = sorted(set(ingredient_ids))
+    if not ingredient_ids:
+        return queryset
+    if connection.vendor == 'postgresql':
+        return queryset.filter(ingredient_ids__contains=ingredient_ids)
+    return queryset.filter(id__in=IngredientsInRecipe.objects.filter(
+        ingredient_id__in=ingredient_ids
+    ).values('recipe_id').annotate(
+        matched=Count('ingredient_id')
+    ).filter(matched=len(ingredient_ids)).values('recipe_id'))
@@ -1,19 +1,78 @@
 import re
 
 from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from djoser.serializers import TokenSerializer as DjoserTokenSerializer
 from djoser.serializers import (
     UserCreateSerializer as DjoserUserCreateSerializer
 )
 from drf_extra_fields.fields import Base64ImageField
 
-from foodgram.settings import RECIPES_LIMIT
-from recipes.models import (Cart, Favourite, Follow, Ingredient,
-                            IngredientsInRecipe, Recipe, Tag)
+from api.authentication import sign_token
+from api.relations import get_relations
+from foodgram.settings import (AUTH_SIGNED_TOKENS, RECIPES_BATCH_LIMIT,
+                               RECIPES_LIMIT)
+from recipes.images import VARIANTS
+from recipes.models import (Follow, Ingredient, IngredientsInRecipe, Recipe,
+                            ShoppingListItem, Tag)
+from recipes.shopping_list import apply_changes
 from rest_framework import serializers
 from user.models import CustomUser
 
 
-class UserSerializer(serializers.ModelSerializer):
+def parse_list(value):
+    return {item.strip() for item in value.split(',') if item.strip()}
+
+
+def get_sparse_fields(request):
+    if request is None or request.method not in ('GET', 'HEAD'):
+        return None, set()
+    fields = request.query_params.get('fields')
+    expand = parse_list(request.query_params.get('expand', ''))
+    if fields is None:
+        return None, expand
+    return parse_list(fields), expand
+
+
+class SparseFieldsMixin:
+    field_sources = {}
+    collapsed_fields = {}
+
+    @classmethod
+    def get_only_fields(cls, fields):
+        model_fields = {field.name
+                        for field in cls.Meta.model._meta.concrete_fields}
+        only = {'id'}
+        for name in fields:
+            only.update(cls.field_sources.get(
+                name, (name,) if name in model_fields else ()
+            ))
+        return only
+
+    def is_root(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self.is_root():
+            return fields
+        requested, expand = get_sparse_fields(self.context.get('request'))
+        if requested is None:
+            return fields
+        for name in list(fields):
+            if name not in requested:
+                del fields[name]
+            elif name in self.collapsed_fields and name not in expand:
+                fields[name] = self.collapsed_fields[name]()
+        return fields
+
+
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     username = serializers.CharField(required=True, max_length=150)
     first_name = serializers.CharField(required=True, max_length=150)
     last_name = serializers.CharField(required=True, max_length=150)
@@ -29,10 +88,9 @@ class UserSerializer(serializers.ModelSerializer):
                         'is_subscribed': {'read_only': True}}
 
     def get_is_subscribed(self, obj):
-        user = self.context.get('request').user
-        if not user.is_anonymous:
-            return Follow.objects.filter(user=user, author=obj).exists()
-        return False
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return obj.id in get_relations(self.context.get('request')).following
 
 
 class UserCreateSerializer(DjoserUserCreateSerializer):
@@ -46,6 +104,15 @@ class UserCreateSerializer(DjoserUserCreateSerializer):
         return username
 
 
+class TokenSerializer(DjoserTokenSerializer):
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if AUTH_SIGNED_TOKENS:
+            data['auth_token'] = sign_token(data['auth_token'])
+        return data
+
+
 class IngredientSerializer(serializers.ModelSerializer):
 
     class Meta:
@@ -74,7 +141,7 @@ class IngredientsInRecipeSerializer(serializers.ModelSerializer):
 
 
 class AddIngredientSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField()
     amount = serializers.IntegerField()
 
     class Meta:
@@ -82,7 +149,42 @@ class AddIngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount')
 
 
+class RecipeImageField(serializers.ImageField):
+    def __init__(self, variant, **kwargs):
+        self.variant = variant
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def build_url(self, name):
+        url = default_storage.url(name)
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+    def to_representation(self, value):
+        name = value.instance.image_variants.get(self.variant, {}).get('jpeg')
+        if name is None:
+            return super().to_representation(value)
+        return self.build_url(name)
+
+
+class RecipeImagesField(RecipeImageField):
+    def __init__(self, **kwargs):
+        kwargs['source'] = 'image'
+        super().__init__(variant=None, **kwargs)
+
+    def to_representation(self, value):
+        return {
+            variant: {extension: self.build_url(name)
+                      for extension, name in files.items()}
+            for variant, files in value.instance.image_variants.items()
+            if variant in VARIANTS
+        }
+
+
 class RecipesByFollowingSerializer(serializers.ModelSerializer):
+    image = RecipeImageField(variant='thumbnail')
 
     class Meta:
         model = Recipe
@@ -91,7 +193,7 @@ class RecipesByFollowingSerializer(serializers.ModelSerializer):
 
 class FollowSerializer(UserSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.ReadOnlyField()
 
     class Meta:
         fields = ('email', 'id', 'username', 'first_name',
@@ -99,6 +201,12 @@ class FollowSerializer(UserSerializer):
         model = CustomUser
 
     def get_recipes(self, obj):
+        recipes_by_author = self.context.get('recipes_by_author')
+        if recipes_by_author is not None:
+            serializer = RecipesByFollowingSerializer(
+                recipes_by_author.get(obj.id, []), many=True
+            )
+            return serializer.data
         recipes_limit = int(
             self.context['request'].GET.get('recipes_limit', RECIPES_LIMIT)
         )
@@ -106,14 +214,9 @@ class FollowSerializer(UserSerializer):
         serializer = RecipesByFollowingSerializer(queryset, many=True)
         return serializer.data
 
-    def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj).count()
-
 
 class RecipeWriteSerializer(serializers.ModelSerializer):
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(),
-        many=True)
+    tags = serializers.ListField(child=serializers.IntegerField())
     ingredients = AddIngredientSerializer(many=True,
                                           source='ingredients_in_recipe')
     image = Base64ImageField(required=True)
@@ -123,27 +226,63 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         fields = ('name', 'tags', 'ingredients',
                   'image', 'text', 'cooking_time')
 
-    def add_tags_ingredients(self, ingredients, tags, model):
-        for ingredient in ingredients:
-            IngredientsInRecipe.objects.create(
+    def add_ingredients(self, ingredients, model):
+        IngredientsInRecipe.objects.bulk_create(
+            IngredientsInRecipe(
                 recipe=model,
-                ingredient=ingredient['id'],
+                ingredient_id=ingredient['id'],
                 amount=ingredient['amount'])
-        model.tags.set(tags)
+            for ingredient in ingredients
+        )
+
+    def update_ingredients(self, ingredients, model):
+        amounts = {ingredient['id']: ingredient['amount']
+                   for ingredient in ingredients}
+        existing = {row.ingredient_id: row
+                    for row in model.ingredients_in_recipe.all()}
+        changes = {ingredient_id: amounts.get(ingredient_id, 0) - row.amount
+                   for ingredient_id, row in existing.items()}
+        removed = existing.keys() - amounts.keys()
+        if removed:
+            model.ingredients_in_recipe.filter(
+                ingredient_id__in=removed
+            ).delete()
+        changed = []
+        for ingredient_id, row in existing.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and row.amount != amount:
+                row.amount = amount
+                changed.append(row)
+        if changed:
+            IngredientsInRecipe.objects.bulk_update(changed, ['amount'])
+        added = [ingredient for ingredient in ingredients
+                 if ingredient['id'] not in existing]
+        if added:
+            self.add_ingredients(added, model)
+        changes.update((ingredient['id'], ingredient['amount'])
+                       for ingredient in added)
+        apply_changes(
+            ShoppingListItem,
+            model.shopping_cart.values_list('user_id', flat=True),
+            changes,
+        )
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients_in_recipe')
         tags = validated_data.pop('tags')
         recipe = super().create(validated_data)
-        self.add_tags_ingredients(ingredients, tags, recipe)
+        self.add_ingredients(ingredients, recipe)
+        recipe.tags.set(tags)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients_in_recipe')
         recipe = super().update(instance, validated_data)
-        recipe.ingredients_in_recipe.all().delete()
-        self.add_tags_ingredients(ingredients, tags, recipe)
+        self.update_ingredients(ingredients, recipe)
+        recipe.tags.set(tags)
         return recipe
 
     def validate(self, data):
@@ -167,14 +306,29 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             set_ingredients.add(ingredient.get('id'))
         if len(set_ingredients) != len(ingredients):
             raise ValidationError('Ингредиенты должны быть уникальны')
+        if len(Tag.objects.in_bulk(tags)) != len(tags):
+            raise ValidationError('Выбран несуществующий тэг')
+        if len(Ingredient.objects.in_bulk(set_ingredients)) != len(
+                set_ingredients):
+            raise ValidationError('Выбран несуществующий ингредиент')
 
         return data
 
     def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance],
+            'tags',
+            Prefetch(
+                'ingredients_in_recipe',
+                queryset=IngredientsInRecipe.objects.select_related(
+                    'ingredient'
+                )
+            ),
+        )
         return RecipeReadSerializer(instance, context=self.context).data
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class RecipeReadSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = UserSerializer()
     tags = TagSerializer(many=True, read_only=True)
     ingredients = IngredientsInRecipeSerializer(
@@ -183,24 +337,40 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         read_only=True)
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    image = RecipeImageField(variant='full')
+    images = RecipeImagesField()
 
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients',
                   'is_favorited', 'is_in_shopping_cart',
-                  'name', 'image', 'text', 'cooking_time')
+                  'name', 'image', 'images', 'text', 'cooking_time')
+
+    field_sources = {
+        'image': ('image', 'image_variants'),
+        'images': ('image', 'image_variants'),
+    }
+    collapsed_fields = {
+        'author': lambda: serializers.PrimaryKeyRelatedField(read_only=True),
+        'tags': lambda: serializers.PrimaryKeyRelatedField(many=True,
+                                                           read_only=True),
+    }
+
+    def get_fields(self):
+        fields = super().get_fields()
+        view = self.context.get('view')
+        if (view is not None and view.action in ('list', 'feed')
+                and 'image' in fields):
+            fields['image'] = RecipeImageField(variant='card')
+        return fields
 
     def get_is_favorited(self, obj):
-        user = self.context.get('request').user
-        if not user.is_anonymous:
-            return Favourite.objects.filter(recipe=obj).exists()
-        return False
+        return obj.id in get_relations(
+            self.context.get('request')
+        ).favourites
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.context.get('request').user
-        if not user.is_anonymous:
-            return Cart.objects.filter(recipe=obj).exists()
-        return False
+        return obj.id in get_relations(self.context.get('request')).cart
 
 
 class SubscribeSerializer(serializers.ModelSerializer):
@@ -221,36 +391,33 @@ class SubscribeSerializer(serializers.ModelSerializer):
         return FollowSerializer(instance.author, context=self.context).data
 
 
-class CartSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Cart
-        fields = ('user', 'recipe')
-
-    def validate(self, data):
-        if Cart.objects.filter(
-            user=data['user'], recipe=data['recipe']
-        ).exists():
-            raise ValidationError('Ингредиенты уже в корзине')
-        return data
-
-    def to_representation(self, instance):
-        return RecipesByFollowingSerializer(instance.recipe,
-                                            context=self.context).data
+class ShoppingListItemSerializer(serializers.ModelSerializer):
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit'
+    )
 
+    class Meta:
+        model = ShoppingListItem
+        fields = ('id', 'name', 'measurement_unit', 'amount')
 
-class FavouriteSerializer(serializers.ModelSerializer):
 
-    class Meta:
-        model = Favourite
-        fields = ('user', 'recipe')
+class RecipeBatchSerializer(serializers.Serializer):
+    add = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        max_length=RECIPES_BATCH_LIMIT, default=list
+    )
+    remove = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        max_length=RECIPES_BATCH_LIMIT, default=list
+    )
 
     def validate(self, data):
-        if Favourite.objects.filter(
-            user=data['user'], recipe=data['recipe']
-        ).exists():
-            raise ValidationError('Рецепт уже добавлен в избранное')
+        if not data['add'] and not data['remove']:
+            raise ValidationError('Укажите рецепты для добавления '
+                                  'или удаления')
+        if set(data['add']) & set(data['remove']):
+            raise ValidationError('Рецепт нельзя одновременно добавить и '
+                                  'удалить')
         return data
-
-    def to_representation(self, instance):
-        return RecipesByFollowingSerializer(instance.recipe,
-                                            context=self.context).data
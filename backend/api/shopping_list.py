@@ -0,0 +1,88 @@
+import csv
+import io
+import json
+from itertools import groupby
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+TITLE = 'Список покупок'
+CSV_HEADER = ('name', 'measurement_unit', 'amount')
+PDF_CHUNK_SIZE = 64 * 1024
+
+
+def group_by_name(ingredients):
+    for name, rows in groupby(ingredients,
+                              key=lambda row: row['ingredient__name']):
+        amounts = ', '.join(
+            f'{row["total_amount"]} {row["ingredient__measurement_unit"]}'
+            for row in rows
+        )
+        yield f'{name} — {amounts}'
+
+
+def render_txt(ingredients):
+    yield f'{TITLE}:\n'
+    for line in group_by_name(ingredients):
+        yield f'{line}\n'
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def render_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for row in ingredients:
+        yield writer.writerow((row['ingredient__name'],
+                               row['ingredient__measurement_unit'],
+                               row['total_amount']))
+
+
+def render_json(ingredients):
+    separator = ''
+    yield '['
+    for row in ingredients:
+        yield separator + json.dumps({
+            'name': row['ingredient__name'],
+            'measurement_unit': row['ingredient__measurement_unit'],
+            'amount': row['total_amount'],
+        }, ensure_ascii=False)
+        separator = ','
+    yield ']'
+
+
+def render_pdf(ingredients):
+    pdfmetrics.registerFont(TTFont('ShoppingList',
+                                   settings.SHOPPING_LIST_FONT))
+    buffer = io.BytesIO()
+    page = canvas.Canvas(buffer, pagesize=A4)
+    height = A4[1]
+    top, bottom, left, step = height - 50, 50, 50, 18
+    page.setFont('ShoppingList', 16)
+    page.drawString(left, top, TITLE)
+    y = top - 2 * step
+    page.setFont('ShoppingList', 12)
+    for line in group_by_name(ingredients):
+        if y < bottom:
+            page.showPage()
+            page.setFont('ShoppingList', 12)
+            y = top
+        page.drawString(left, y, line)
+        y -= step
+    page.save()
+    buffer.seek(0)
+    yield from iter(lambda: buffer.read(PDF_CHUNK_SIZE), b'')
+
+
+SHOPPING_LIST_FORMATS = {
+    'txt': ('text/plain; charset=utf-8', render_txt),
+    'csv': ('text/csv; charset=utf-8', render_csv),
+    'json': ('application/json', render_json),
+    'pdf': ('application/pdf', render_pdf),
+}
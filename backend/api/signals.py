@@ -0,0 +1,44 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from rest_framework.authtoken.models import Token
+
+from api.authentication import invalidate_token, invalidate_user_tokens
+from api.relations import invalidate_relations
+from foodgram.cache import invalidate_author, invalidate_catalog
+from recipes.models import (Cart, Favourite, Follow, Ingredient,
+                            IngredientsInRecipe, Recipe, Tag)
+
+CATALOG_MODELS = (Tag, Ingredient, Recipe)
+RELATION_MODELS = (Favourite, Cart, Follow)
+
+
+def connect_catalog_signals():
+    for model in CATALOG_MODELS:
+        post_save.connect(invalidate_catalog, sender=model,
+                          dispatch_uid=f'catalog_save_{model.__name__}')
+        post_delete.connect(invalidate_catalog, sender=model,
+                            dispatch_uid=f'catalog_delete_{model.__name__}')
+    # Ingredient rows are deleted together with a Recipe save or delete,
+    # which already invalidates; a post_delete receiver here would only
+    # turn their cascade into row-by-row deletes.
+    post_save.connect(invalidate_catalog, sender=IngredientsInRecipe,
+                      dispatch_uid='catalog_save_IngredientsInRecipe')
+    m2m_changed.connect(invalidate_catalog, sender=Recipe.tags.through,
+                        dispatch_uid='catalog_recipe_tags')
+    post_save.connect(invalidate_author, sender=get_user_model(),
+                      dispatch_uid='catalog_save_author')
+
+
+def connect_relation_signals():
+    for model in RELATION_MODELS:
+        post_save.connect(invalidate_relations, sender=model,
+                          dispatch_uid=f'relations_save_{model.__name__}')
+        post_delete.connect(invalidate_relations, sender=model,
+                            dispatch_uid=f'relations_delete_{model.__name__}')
+
+
+def connect_auth_signals():
+    post_delete.connect(invalidate_token, sender=Token,
+                        dispatch_uid='auth_token_delete')
+    post_save.connect(invalidate_user_tokens, sender=get_user_model(),
+                      dispatch_uid='auth_user_save')
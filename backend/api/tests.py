@@ -0,0 +1,1011 @@
+import base64
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from api.async_views import AsyncRouter, run_in_thread
+from api.compression import brotli, compress_response
+from api.metrics import RequestStats, current_stats, registry
+from api.relations import bump_relations_version
+from api.renderers import FastJSONRenderer
+from api.search import SortedArrayIngredientSearch
+from api.serializers import TagSerializer
+from api.views import RecipeViewSet
+from foodgram.cache import bump_catalog_version, get_catalog_version
+from foodgram.connections import HealthCheckMixin, health_check_failures
+from recipes import search
+from recipes.catalog import read_json
+from recipes.images import SyncQueue, process_recipe_image
+from recipes.models import (Cart, Favourite, FeedEntry, Follow, Ingredient,
+                            IngredientsInRecipe, Recipe, ShoppingListItem,
+                            Tag)
+from user.models import CustomUser
+
+IMAGE = 'media/test.png'
+
+async_router = AsyncRouter()
+async_router.register('recipes', RecipeViewSet)
+urlpatterns = [path('api/', include(async_router.urls))]
+
+
+def render_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), 'white').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def encode_image():
+    return ('data:image/png;base64,'
+            + base64.b64encode(render_image()).decode('ascii'))
+
+
+class APITestMixin:
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def create_user(self, name):
+        return CustomUser.objects.create_user(
+            username=name, email=f'{name}@example.com', password='Pass1234!',
+            first_name=name, last_name=name,
+        )
+
+    def create_recipe(self, author, ingredients=(), tags=(), name='Рецепт'):
+        recipe = Recipe.objects.create(
+            author=author, name=name, text='Текст', cooking_time=10,
+            image=IMAGE, image_variants={'source': IMAGE},
+        )
+        recipe.tags.set(tags)
+        IngredientsInRecipe.objects.bulk_create(
+            IngredientsInRecipe(recipe=recipe, ingredient=ingredient,
+                                amount=amount)
+            for ingredient, amount in ingredients
+        )
+        return recipe
+
+    def authenticate(self, user):
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+
+class RecipeListQueriesTest(APITestMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.reader = self.create_user('reader')
+        authors = [self.create_user(f'author{index}') for index in range(5)]
+        tags = [Tag.objects.create(name=f'Тег {index}', slug=f'tag{index}',
+                                   color='#ffffff') for index in range(3)]
+        ingredients = [
+            Ingredient.objects.create(name=f'Ингредиент {index}',
+                                      measurement_unit='г')
+            for index in range(5)
+        ]
+        for index in range(60):
+            recipe = self.create_recipe(
+                authors[index % len(authors)],
+                [(ingredient, index + 1) for ingredient in ingredients[:3]],
+                tags[:2], name=f'Рецепт {index}',
+            )
+            if index % 3 == 0:
+                Favourite.objects.create(user=self.reader, recipe=recipe)
+            if index % 4 == 0:
+                Cart.objects.create(user=self.reader, recipe=recipe)
+        Follow.objects.create(user=self.reader, author=authors[0])
+
+    def assert_constant(self):
+        small = self.count_queries('/api/recipes/?limit=2')
+        large = self.count_queries('/api/recipes/?limit=50')
+        self.assertEqual(small, large)
+
+    def test_anonymous_list_queries_do_not_depend_on_page_size(self):
+        self.assert_constant()
+
+    def test_authenticated_list_queries_do_not_depend_on_page_size(self):
+        self.authenticate(self.reader)
+        self.assert_constant()
+
+    def test_flags(self):
+        self.authenticate(self.reader)
+        response = self.client.get('/api/recipes/?limit=60')
+        recipes = {recipe['name']: recipe
+                   for recipe in response.json()['results']}
+        self.assertTrue(recipes['Рецепт 0']['is_favorited'])
+        self.assertTrue(recipes['Рецепт 0']['is_in_shopping_cart'])
+        self.assertTrue(recipes['Рецепт 0']['author']['is_subscribed'])
+        self.assertFalse(recipes['Рецепт 1']['is_favorited'])
+        self.assertFalse(recipes['Рецепт 1']['is_in_shopping_cart'])
+        self.assertFalse(recipes['Рецепт 1']['author']['is_subscribed'])
+
+
+class KeysetPaginationTest(APITestMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        author = self.create_user('author')
+        self.recipes = [self.create_recipe(author, name=f'Рецепт {index}')
+                        for index in range(7)]
+        Recipe.objects.update(pub_date=Recipe.objects.get(
+            pk=self.recipes[0].pk
+        ).pub_date)
+
+    def collect(self, url, link):
+        names = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            names.append([recipe['id'] for recipe in data['results']])
+            url = data[link]
+        return names
+
+    def test_cursor_walks_every_recipe_once(self):
+        pages = self.collect('/api/recipes/?limit=3&cursor=', 'next')
+        expected = sorted((recipe.pk for recipe in self.recipes),
+                          reverse=True)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), expected)
+
+    def test_previous_link_returns_to_previous_page(self):
+        first = self.client.get('/api/recipes/?limit=3&cursor=').json()
+        second = self.client.get(first['next']).json()
+        back = self.client.get(second['previous']).json()
+        self.assertEqual([recipe['id'] for recipe in back['results']],
+                         [recipe['id'] for recipe in first['results']])
+        self.assertIsNone(back['previous'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/recipes/?cursor=broken')
+        self.assertEqual(response.status_code, 404)
+
+
+class ToggleTest(APITestMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('user')
+        self.recipe = self.create_recipe(self.create_user('author'))
+        self.authenticate(self.user)
+
+    def test_favorite_add_and_remove(self):
+        url = f'/api/recipes/{self.recipe.pk}/favorite/'
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favourites_count, 1)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.delete(url).status_code, 400)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favourites_count, 0)
+        self.assertFalse(Favourite.objects.exists())
+
+    def test_missing_recipe(self):
+        self.assertEqual(
+            self.client.post('/api/recipes/0/shopping_cart/').status_code,
+            404
+        )
+        self.assertEqual(
+            self.client.delete('/api/recipes/0/shopping_cart/').status_code,
+            404
+        )
+
+    def test_batch(self):
+        other = self.create_recipe(self.recipe.author)
+        Cart.objects.create(user=self.user, recipe=self.recipe)
+        response = self.client.post(
+            '/api/recipes/shopping_cart/',
+            {'add': [other.pk, 999999], 'remove': [self.recipe.pk]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(),
+                         {'added': [other.pk], 'removed': [self.recipe.pk]})
+        self.assertEqual(
+            list(Cart.objects.values_list('recipe_id', flat=True)),
+            [other.pk]
+        )
+
+
+class ShoppingListTest(APITestMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('user')
+        author = self.create_user('author')
+        self.flour, self.milk, self.eggs = (
+            Ingredient.objects.create(name=name, measurement_unit=unit)
+            for name, unit in (('Мука', 'г'), ('Молоко', 'мл'),
+                               ('Яйца', 'шт'))
+        )
+        self.tag = Tag.objects.create(name='Завтрак', slug='breakfast',
+                                      color='#ffffff')
+        self.pancakes = self.create_recipe(
+            author, [(self.flour, 200), (self.milk, 500), (self.eggs, 2)],
+            [self.tag],
+        )
+        self.bread = self.create_recipe(author, [(self.flour, 300)])
+        self.authenticate(self.user)
+
+    def items(self):
+        return dict(ShoppingListItem.objects.filter(
+            user=self.user
+        ).values_list('ingredient__name', 'amount'))
+
+    def cart(self, method, recipe):
+        url = f'/api/recipes/{recipe.pk}/shopping_cart/'
+        return getattr(self.client, method)(url)
+
+    def test_deltas(self):
+        self.cart('post', self.pancakes)
+        self.assertEqual(self.items(),
+                         {'Мука': 200, 'Молоко': 500, 'Яйца': 2})
+        self.cart('post', self.bread)
+        self.assertEqual(self.items(),
+                         {'Мука': 500, 'Молоко': 500, 'Яйца': 2})
+        self.cart('delete', self.pancakes)
+        self.assertEqual(self.items(), {'Мука': 300})
+        self.cart('delete', self.bread)
+        self.assertEqual(self.items(), {})
+
+    def test_existing_row_is_added_to(self):
+        ShoppingListItem.objects.create(user=self.user,
+                                        ingredient=self.flour, amount=50)
+        self.cart('post', self.bread)
+        self.assertEqual(self.items(), {'Мука': 350})
+
+    def test_recipe_change_updates_list(self):
+        self.cart('post', self.pancakes)
+        response = self.client.get('/api/recipes/shopping_list/')
+        self.assertEqual(len(response.json()), 3)
+        self.authenticate(self.pancakes.author)
+        response = self.client.patch(
+            f'/api/recipes/{self.pancakes.pk}/',
+            {'ingredients': [{'id': self.flour.pk, 'amount': 100}],
+             'tags': [self.tag.pk], 'name': 'Блины', 'text': 'Текст',
+             'cooking_time': 10, 'image': encode_image()},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.items(), {'Мука': 100})
+
+    def test_download(self):
+        self.cart('post', self.pancakes)
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/?format=csv'
+        )
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertIn('Мука,г,200', content)
+
+
+class FastJSONRendererTest(APITestMixin, APITestCase):
+
+    def test_matches_stock_renderer_on_error_payload(self):
+        data = {'tags': {0: ['Неверное значение.']},
+                'text': 'строка\u2028', 'amount': 1.5}
+        self.assertEqual(FastJSONRenderer().render(data),
+                         JSONRenderer().render(data))
+
+    def test_list_field_errors(self):
+        self.authenticate(self.create_user('user'))
+        response = self.client.post('/api/recipes/favorite/',
+                                    {'add': ['x']}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('0', response.json()['add'])
+
+
+class RecipeWriteQueriesTest(APITestMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.author = self.create_user('author')
+        self.tag = Tag.objects.create(name='Обед', slug='lunch',
+                                      color='#ffffff')
+        self.ingredients = [
+            Ingredient.objects.create(name=f'Ингредиент {index}',
+                                      measurement_unit='г')
+            for index in range(60)
+        ]
+        self.authenticate(self.author)
+
+    def delete_queries(self, count):
+        recipe = self.create_recipe(
+            self.author,
+            [(ingredient, 1) for ingredient in self.ingredients[:count]],
+        )
+        with CaptureQueriesContext(connection) as context:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.delete(f'/api/recipes/{recipe.pk}/')
+        self.assertEqual(response.status_code, 204)
+        return len(context.captured_queries)
+
+    def save_queries(self, method, url, ingredients):
+        images = mock.patch('recipes.images.get_queue',
+                            return_value=SyncQueue())
+        images.start()
+        self.addCleanup(images.stop)
+        with CaptureQueriesContext(connection) as context:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = getattr(self.client, method)(
+                    url,
+                    {'ingredients': [{'id': ingredient.pk, 'amount': amount}
+                                     for ingredient, amount in ingredients],
+                     'tags': [self.tag.pk], 'name': 'Суп', 'text': 'Текст',
+                     'cooking_time': 10, 'image': encode_image()},
+                    format='json',
+                )
+        self.assertLess(response.status_code, 300, response.content)
+        return len(context.captured_queries)
+
+    def create_queries(self, count):
+        return self.save_queries(
+            'post', '/api/recipes/',
+            [(ingredient, 1) for ingredient in self.ingredients[:count]],
+        )
+
+    def update_queries(self, count):
+        recipe = self.create_recipe(
+            self.author,
+            [(ingredient, 1) for ingredient in self.ingredients[:count]],
+            [self.tag],
+        )
+        Cart.objects.create(user=self.create_user(f'buyer{count}'),
+                            recipe=recipe)
+        half = count // 2
+        return self.save_queries(
+            'patch', f'/api/recipes/{recipe.pk}/',
+            [(ingredient, 2) for ingredient in self.ingredients[:half]]
+            + [(ingredient, 1)
+               for ingredient in self.ingredients[count:count + half]],
+        )
+
+    def test_create_queries_do_not_depend_on_ingredients(self):
+        self.assertEqual(self.create_queries(1), self.create_queries(30))
+        self.assertEqual(self.create_queries(1), self.create_queries(60))
+
+    def test_update_queries_do_not_depend_on_ingredients(self):
+        self.assertEqual(self.update_queries(2), self.update_queries(30))
+
+    def test_delete_queries_do_not_depend_on_ingredients(self):
+        self.assertEqual(self.delete_queries(1), self.delete_queries(30))
+
+    def test_search_refreshed_once_per_transaction(self):
+        recipe = self.create_recipe(
+            self.author,
+            [(ingredient, 1) for ingredient in self.ingredients[:30]],
+            [self.tag],
+        )
+        added = self.ingredients[30:]
+        images = mock.patch('recipes.images.get_queue',
+                            return_value=SyncQueue())
+        images.start()
+        self.addCleanup(images.stop)
+        with mock.patch.object(search, 'update_search',
+                               wraps=search.update_search) as update:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.patch(
+                    f'/api/recipes/{recipe.pk}/',
+                    {'ingredients': [{'id': ingredient.pk, 'amount': 2}
+                                     for ingredient in added],
+                     'tags': [self.tag.pk], 'name': 'Суп', 'text': 'Текст',
+                     'cooking_time': 10, 'image': encode_image()},
+                    format='json',
+                )
+        self.assertEqual(response.status_code, 200, response.content)
+        update.assert_called_once()
+        self.assertIn(recipe.pk, update.call_args.args[2])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.ingredient_ids,
+                         [ingredient.pk for ingredient in added])
+
+
+class CounterTest(APITestMixin, APITestCase):
+
+    def test_full_save_keeps_counters(self):
+        user = self.create_user('user')
+        recipe = self.create_recipe(self.create_user('author'))
+        stale = Recipe.objects.get(pk=recipe.pk)
+        Favourite.objects.create(user=user, recipe=recipe)
+        Follow.objects.create(user=user, author=recipe.author)
+        stale.name = 'Новое название'
+        stale.save()
+        recipe.author.first_name = 'Автор'
+        recipe.author.save()
+        recipe.refresh_from_db()
+        recipe.author.refresh_from_db()
+        self.assertEqual(recipe.name, 'Новое название')
+        self.assertEqual(recipe.favourites_count, 1)
+        self.assertEqual(recipe.author.followers_count, 1)
+        self.assertEqual(recipe.author.recipes_count, 1)
+
+    def test_counter_does_not_go_below_zero(self):
+        user = self.create_user('user')
+        recipe = self.create_recipe(self.create_user('author'))
+        Favourite.objects.create(user=user, recipe=recipe)
+        Recipe.objects.filter(pk=recipe.pk).update(favourites_count=0)
+        Favourite.objects.filter(user=user).delete()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favourites_count, 0)
+
+
+class FeedTest(APITestMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.reader = self.create_user('reader')
+        self.author = self.create_user('author')
+        self.other = self.create_user('other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.tag = Tag.objects.create(name='Ужин', slug='dinner',
+                                      color='#ffffff')
+        self.recipes = [
+            self.create_recipe(self.author, name=f'Рецепт {index}',
+                               tags=[self.tag] if index % 2 else [])
+            for index in range(5)
+        ]
+        self.create_recipe(self.other, name='Чужой рецепт')
+        self.authenticate(self.reader)
+
+    def ids(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.json()['results']]
+
+    def test_feed_pages_over_feed_entries(self):
+        expected = [recipe.pk for recipe in reversed(self.recipes)]
+        self.assertEqual(self.ids(self.client.get('/api/recipes/feed/')),
+                         expected)
+        first = self.client.get('/api/recipes/feed/?cursor=&limit=3')
+        second = self.client.get(first.json()['next'])
+        self.assertEqual(self.ids(first) + self.ids(second), expected)
+
+    def test_feed_query_uses_feed_table(self):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get('/api/recipes/feed/?cursor=&limit=3')
+        feed_table = FeedEntry._meta.db_table
+        self.assertTrue(any(
+            query['sql'].startswith('SELECT')
+            and f'FROM "{feed_table}"' in query['sql']
+            and 'ORDER BY' in query['sql']
+            for query in context.captured_queries
+        ))
+
+    def test_feed_filters(self):
+        response = self.client.get('/api/recipes/feed/?tags=dinner')
+        self.assertEqual(self.ids(response),
+                         [self.recipes[3].pk, self.recipes[1].pk])
+
+
+class HealthCheckTest(APITestCase):
+
+    def create_connection(self):
+        wrapper = type('CheckedWrapper',
+                       (HealthCheckMixin, type(connections['default'])), {})
+        checked = wrapper({
+            **connections['default'].settings_dict,
+            'CONN_MAX_AGE': None, 'CONN_HEALTH_CHECKS': True,
+        }, 'default')
+        self.addCleanup(checked.close)
+        return checked
+
+    def test_checked_lazily_once_per_request(self):
+        checked = self.create_connection()
+        checked.cursor()
+        failures = health_check_failures.get('default', 0)
+        checked.close_if_unusable_or_obsolete()
+        with mock.patch.object(type(checked), 'is_usable',
+                               return_value=False) as is_usable:
+            self.assertFalse(is_usable.called)
+            checked.cursor()
+            checked.cursor()
+        self.assertEqual(is_usable.call_count, 1)
+        self.assertEqual(health_check_failures['default'], failures + 1)
+
+    def test_worker_threads_mark_connections_for_check(self):
+        threads = []
+
+        async def run():
+            return await run_in_thread(threading.get_ident)
+
+        with mock.patch('api.async_views.close_old_connections',
+                        side_effect=lambda: threads.append(
+                            threading.get_ident()
+                        )):
+            worker = async_to_sync(run)()
+        self.assertNotEqual(worker, threading.get_ident())
+        self.assertEqual(threads, [worker, worker])
+
+
+class ImageVariantsTest(APITestMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.create_recipe(self.create_user('author'))
+
+    def set_image(self):
+        name = default_storage.save('media/recipe.png',
+                                    ContentFile(render_image()))
+        Recipe.objects.filter(pk=self.recipe.pk).update(image=name)
+        process_recipe_image(self.recipe.pk, name)
+        self.recipe.refresh_from_db()
+        return [name for variant, files in self.recipe.image_variants.items()
+                if variant != 'source' for name in files.values()]
+
+    def test_variants_invalidate_catalog(self):
+        version = get_catalog_version()
+        self.set_image()
+        self.assertNotEqual(get_catalog_version(), version)
+
+    def test_replaced_variants_are_deleted(self):
+        old = self.set_image()
+        new = self.set_image()
+        self.assertTrue(all(default_storage.exists(name) for name in new))
+        self.assertFalse(any(default_storage.exists(name) for name in old))
+
+    def test_variants_deleted_with_recipe(self):
+        names = self.set_image()
+        with mock.patch('recipes.images.get_queue', return_value=SyncQueue()):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.recipe.delete()
+        self.assertFalse(any(default_storage.exists(name) for name in names))
+
+
+@skipUnless(connection.vendor == 'sqlite', 'нужна база SQLite')
+class ReplicaRoutingTest(APITestMixin, APITestCase):
+    # The replica is a second, separately migrated SQLite database that
+    # never receives writes, i.e. a replica lagging forever. It is added
+    # in setUpClass, after the runner has set up the configured databases.
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        connections.settings['replica'] = {
+            **connections.settings['default'], 'NAME': ':memory:',
+        }
+        call_command('migrate', database='replica', verbosity=0)
+        replicas = mock.patch('foodgram.replicas.get_replicas',
+                              return_value=['replica'])
+        replicas.start()
+        cls.addClassCleanup(replicas.stop)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('reader')
+
+    def test_reads_go_to_replica(self):
+        self.create_recipe(self.user)
+        response = self.client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 0)
+
+    def test_first_read_after_login_is_sticky(self):
+        response = self.client.post('/api/auth/token/login/', {
+            'email': self.user.email, 'password': 'Pass1234!',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {response.data["auth_token"]}')
+        response = self.client.get('/api/users/me/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], self.user.pk)
+
+
+class ReadJSONTest(APITestMixin, APITestCase):
+
+    def write(self, content):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'ingredients.json')
+        with open(path, 'w', encoding='utf-8') as target:
+            target.write(content)
+        return path
+
+    def test_rows_are_streamed(self):
+        rows = [{'name': f'Соль {index}', 'measurement_unit': 'г'}
+                for index in range(20)]
+        path = self.write(json.dumps(rows, ensure_ascii=False, indent=2))
+        self.assertEqual(list(read_json(path, chunk_size=7)), rows)
+        self.assertEqual(list(read_json(self.write(' [ ] '))), [])
+
+    def test_not_an_array(self):
+        with self.assertRaises(ValueError):
+            list(read_json(self.write('{"name": "Соль"}')))
+
+
+class IngredientSearchTest(APITestMixin, APITestCase):
+
+    def test_index_follows_catalog_version(self):
+        salt = Ingredient.objects.create(name='Соль', measurement_unit='г')
+        search = SortedArrayIngredientSearch()
+        queryset = Ingredient.objects.all()
+        self.assertEqual(list(search.search(queryset, 'со', 10)), [salt])
+        soda = Ingredient.objects.create(name='Сода', measurement_unit='г')
+        bump_catalog_version()
+        ids = search.index[2]
+        self.assertEqual(list(search.search(queryset, 'со', 10)),
+                         [soda, salt])
+        self.assertIsNot(search.index[2], ids)
+        self.assertEqual(search.index[1:], (['сода', 'соль'],
+                                            [soda.pk, salt.pk]))
+
+
+class ThrottlingTest(APITestMixin, APITestCase):
+
+    def test_throttled_message_is_localized(self):
+        rates = {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'],
+                 'anon': '1/minute'}
+        with override_settings(REST_FRAMEWORK={
+                **settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates}):
+            for url in ('/api/users/', '/api/tags/', '/api/ingredients/'):
+                cache.clear()
+                self.client.get(url)
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 429)
+                self.assertTrue(response.data['detail'].startswith(
+                    'Слишком много запросов.'))
+                self.assertIn('Retry-After', response)
+
+    @override_settings(CONCURRENCY_LIMITS={'shopping_list': 1})
+    def test_slot_is_held_while_streaming(self):
+        user = self.create_user('user')
+        ShoppingListItem.objects.bulk_create(
+            ShoppingListItem(user=user, amount=index, ingredient=(
+                Ingredient.objects.create(name=f'Ингредиент {index}',
+                                          measurement_unit='г')))
+            for index in range(1, 4)
+        )
+        self.authenticate(user)
+        url = '/api/recipes/download_shopping_cart/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        content = iter(response.streaming_content)
+        next(content)
+        self.assertEqual(self.client.get(url).status_code, 429)
+        b''.join(content)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        b''.join(response.streaming_content)
+
+
+class SerializerTimerTest(APITestMixin, APITestCase):
+
+    def test_serializer_time_is_recorded_by_views(self):
+        self.create_recipe(self.create_user('author'))
+        with mock.patch.object(registry, 'record') as record:
+            response = self.client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        stats = record.call_args.args[3]
+        self.assertGreater(stats.serializer_time, 0)
+
+    def test_streaming_response_is_measured_until_closed(self):
+        user = self.create_user('user')
+        ShoppingListItem.objects.create(
+            user=user, amount=1, ingredient=Ingredient.objects.create(
+                name='Соль', measurement_unit='г'))
+        self.authenticate(user)
+        with mock.patch.object(registry, 'record') as record:
+            response = self.client.get(
+                '/api/recipes/download_shopping_cart/')
+            record.assert_not_called()
+            content = b''.join(response.streaming_content)
+        stats, size = record.call_args.args[3:]
+        self.assertEqual(size, len(content))
+        self.assertGreater(stats.queries, 0)
+
+    def test_serializers_are_not_patched(self):
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        self.addCleanup(current_stats.reset, token)
+        TagSerializer(Tag(name='Обед', slug='lunch', color='#49B64E')).data
+        self.assertEqual(stats.serializer_time, 0)
+
+
+@override_settings(ROOT_URLCONF='api.tests')
+class AsyncViewsTest(APITestMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('user')
+        self.create_recipe(self.user)
+        self.token = Token.objects.create(user=self.user)
+        # Worker threads would open their own connections, which cannot see
+        # the test transaction; the main thread keeps the loop check intact.
+        in_main_thread = mock.patch(
+            'api.async_views.run_in_thread',
+            lambda func, *args, **kwargs: sync_to_async(func)(*args,
+                                                              **kwargs),
+        )
+        in_main_thread.start()
+        self.addCleanup(in_main_thread.stop)
+
+    async def test_browsable_api_renders_off_the_loop(self):
+        response = await self.async_client.get(
+            '/api/recipes/', ACCEPT='text/html',
+            AUTHORIZATION=f'Token {self.token.key}',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'<html', response.content)
+
+
+class RelationsTest(APITestMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('user')
+        self.recipe = self.create_recipe(self.create_user('author'))
+        self.authenticate(self.user)
+
+    def is_favorited(self):
+        return self.client.get(
+            f'/api/recipes/{self.recipe.pk}/').data['is_favorited']
+
+    def test_local_cache_loads_relations_per_request(self):
+        self.assertFalse(self.is_favorited())
+        # Another worker adds the favourite: this process sees no bump.
+        with mock.patch('api.relations.bump_relations_version'):
+            Favourite.objects.create(user=self.user, recipe=self.recipe)
+        self.assertTrue(self.is_favorited())
+
+    def test_shared_cache_keeps_relations_until_bumped(self):
+        with mock.patch('api.relations.is_shared', return_value=True):
+            self.assertFalse(self.is_favorited())
+            Favourite.objects.create(user=self.user, recipe=self.recipe)
+            self.assertFalse(self.is_favorited())
+            bump_relations_version(self.user.pk)
+            self.assertTrue(self.is_favorited())
+
+
+class TokenAuthenticationTest(APITestMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('user')
+        shared = mock.patch('api.authentication.is_shared', return_value=True)
+        shared.start()
+        self.addCleanup(shared.stop)
+
+    def login(self):
+        response = self.client.post('/api/auth/token/login/', {
+            'email': self.user.email, 'password': 'Pass1234!',
+        })
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {response.data["auth_token"]}')
+        return response.data['auth_token']
+
+    def me(self):
+        return self.client.get('/api/users/me/').status_code
+
+    def test_logout_revokes_cached_token(self):
+        self.login()
+        self.assertEqual(self.me(), 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/auth/token/logout/')
+        self.assertEqual(self.me(), 401)
+
+    def test_deactivation_revokes_cached_token(self):
+        self.login()
+        self.assertEqual(self.me(), 200)
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(self.me(), 401)
+
+    def test_local_cache_is_not_used(self):
+        self.login()
+        self.assertEqual(self.me(), 200)
+        with mock.patch('api.authentication.is_shared', return_value=False):
+            # Another worker revoked the token: nothing was forgotten here.
+            with mock.patch('api.authentication.forget_token'):
+                Token.objects.filter(user=self.user).delete()
+            self.assertEqual(self.me(), 401)
+
+    @mock.patch('api.serializers.AUTH_SIGNED_TOKENS', True)
+    def test_signed_token(self):
+        key = self.login()
+        self.assertIn(':', key)
+        self.assertEqual(self.me(), 200)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {key}x')
+        self.assertEqual(self.me(), 401)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/auth/token/logout/')
+        self.assertEqual(self.me(), 401)
+
+
+class CatalogCacheTest(APITestMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.author = self.create_user('author')
+        self.tag = Tag.objects.create(name='Обед', slug='lunch',
+                                      color='#ffffff')
+        self.ingredient = Ingredient.objects.create(name='Соль',
+                                                    measurement_unit='г')
+        self.recipe = self.create_recipe(self.author, [(self.ingredient, 1)],
+                                         [self.tag])
+        self.url = f'/api/recipes/{self.recipe.pk}/'
+        images = mock.patch('recipes.images.get_queue',
+                            return_value=SyncQueue())
+        images.start()
+        self.addCleanup(images.stop)
+
+    def test_anonymous_detail_is_served_from_cache(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content, first.content)
+
+    def test_etag_answers_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.authenticate(self.author)
+        etag = self.client.get('/api/recipes/')['ETag']
+        response = self.client.get('/api/recipes/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_recipe_edit_invalidates(self):
+        self.client.get(self.url)
+        self.authenticate(self.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(self.url, {
+                'ingredients': [{'id': self.ingredient.pk, 'amount': 2}],
+                'tags': [self.tag.pk], 'name': 'Борщ', 'text': 'Текст',
+                'cooking_time': 10, 'image': encode_image(),
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.client.credentials()
+        self.assertEqual(self.client.get(self.url).json()['name'], 'Борщ')
+
+    def test_author_change_invalidates(self):
+        self.client.get(self.url)
+        self.author.first_name = 'Автор'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.save()
+        author = self.client.get(self.url).json()['author']
+        self.assertEqual(author['first_name'], 'Автор')
+
+    def test_login_keeps_catalog(self):
+        version = get_catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/auth/token/login/', {
+                'email': self.author.email, 'password': 'Pass1234!',
+            })
+        self.assertEqual(get_catalog_version(), version)
+
+
+class CompressionTest(APITestMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {index}', measurement_unit='г')
+            for index in range(100)
+        )
+
+    def test_large_json_is_gzipped(self):
+        plain = self.client.get('/api/ingredients/')
+        response = self.client.get('/api/ingredients/',
+                                   HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    @skipUnless(brotli, 'brotli не установлен')
+    def test_brotli_is_preferred(self):
+        plain = self.client.get('/api/ingredients/')
+        response = self.client.get('/api/ingredients/',
+                                   HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), plain.content)
+
+    def test_small_body_is_left_alone(self):
+        Tag.objects.create(name='Обед', slug='lunch', color='#ffffff')
+        response = self.client.get('/api/tags/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_encoded_response_is_left_alone(self):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        content = gzip.compress(b'{}' * 2048)
+        response = HttpResponse(content, content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+        response = compress_response(request, response)
+        self.assertEqual(response.content, content)
+        self.assertFalse(response.has_header('Vary'))
+
+    def test_streamed_shopping_list_is_gzipped(self):
+        user = self.create_user('user')
+        ShoppingListItem.objects.bulk_create(
+            ShoppingListItem(user=user, ingredient=ingredient, amount=1)
+            for ingredient in Ingredient.objects.all()
+        )
+        self.authenticate(user)
+        url = '/api/recipes/download_shopping_cart/'
+        plain = b''.join(self.client.get(url).streaming_content)
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content)), plain)
+        self.assertIn('Ингредиент 99'.encode(), plain)
+
+
+class SparseFieldsTest(APITestMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.author = self.create_user('author')
+        self.tag = Tag.objects.create(name='Обед', slug='lunch',
+                                      color='#ffffff')
+        self.recipe = self.create_recipe(self.author, tags=[self.tag])
+
+    def get_recipe(self, query):
+        response = self.client.get(f'/api/recipes/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results'][0]
+
+    def test_only_requested_fields_are_returned(self):
+        self.assertEqual(self.get_recipe('fields=id,name'),
+                         {'id': self.recipe.pk, 'name': 'Рецепт'})
+
+    def test_relations_collapse_to_ids(self):
+        recipe = self.get_recipe('fields=id,author,tags')
+        self.assertEqual(recipe['author'], self.author.pk)
+        self.assertEqual(recipe['tags'], [self.tag.pk])
+
+    def test_expanded_relations(self):
+        recipe = self.get_recipe('fields=author,tags&expand=author,tags')
+        self.assertEqual(set(recipe), {'author', 'tags'})
+        self.assertEqual(recipe['author']['username'], 'author')
+        self.assertEqual(recipe['tags'][0]['slug'], 'lunch')
+
+    def test_unknown_fields_are_ignored(self):
+        self.assertEqual(self.get_recipe('fields=id,bogus&expand=bogus'),
+                         {'id': self.recipe.pk})
+
+    def test_full_representation_without_fields(self):
+        recipe = self.get_recipe('')
+        self.assertEqual(recipe['author']['username'], 'author')
+        self.assertIn('ingredients', recipe)
@@ -0,0 +1,148 @@
+import math
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import views
+from rest_framework.exceptions import Throttled
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class RequestThrottled(Throttled):
+    default_detail = 'Слишком много запросов.'
+    extra_detail_singular = 'Повторите через {wait} с.'
+    extra_detail_plural = 'Повторите через {wait} с.'
+
+
+def exception_handler(exc, context):
+    if isinstance(exc, Throttled) and not isinstance(exc, RequestThrottled):
+        exc = RequestThrottled(exc.wait)
+    return views.exception_handler(exc, context)
+
+
+def get_cache():
+    return caches[settings.THROTTLE_CACHE]
+
+
+def get_slot_key(scope):
+    return f'api:concurrency:{scope}'
+
+
+def acquire_slot(scope):
+    limit = settings.CONCURRENCY_LIMITS.get(scope)
+    if not limit:
+        return False
+    cache = get_cache()
+    key = get_slot_key(scope)
+    cache.add(key, 0, settings.CONCURRENCY_SLOT_TIMEOUT)
+    try:
+        busy = cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, settings.CONCURRENCY_SLOT_TIMEOUT)
+        busy = 1
+    if busy > limit:
+        release_slot(scope)
+        raise RequestThrottled(wait=settings.CONCURRENCY_RETRY_AFTER)
+    return True
+
+
+def release_slot(scope):
+    try:
+        get_cache().decr(get_slot_key(scope))
+    except ValueError:
+        pass
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    cache_format = 'api:throttle:%(scope)s:%(ident)s'
+
+    def __init__(self):
+        self.cache = get_cache()
+        super().__init__()
+
+    @property
+    def THROTTLE_RATES(self):
+        return api_settings.DEFAULT_THROTTLE_RATES
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def allow_request(self, request, view):
+        # The bucket is read and written back without a lock: concurrent
+        # requests of one client may each spend the same token, so a burst
+        # can exceed the limit by the number of requests in flight. The
+        # concurrency slots below are counted atomically and cap that.
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        now = self.timer()
+        refill = self.num_requests / self.duration
+        tokens, updated = self.cache.get(self.key, (self.num_requests, now))
+        tokens = min(self.num_requests, tokens + (now - updated) * refill)
+        if tokens < 1:
+            self.wait_time = (1 - tokens) / refill
+            return False
+        self.cache.set(self.key, (tokens - 1, now), self.duration)
+        return True
+
+    def wait(self):
+        return math.ceil(self.wait_time)
+
+
+class AnonBucketThrottle(TokenBucketThrottle):
+    scope = 'anon'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return super().get_cache_key(request, view)
+
+
+class UserBucketThrottle(TokenBucketThrottle):
+    scope = 'user'
+
+
+class ActionBucketThrottle(TokenBucketThrottle):
+
+    def __init__(self, scope):
+        self.scope = scope
+        super().__init__()
+
+
+class AdmissionControlMixin:
+    throttle_scopes = {}
+    concurrency_scope = None
+
+    def get_throttle_scope(self):
+        return self.throttle_scopes.get(getattr(self, 'action', None))
+
+    def get_throttles(self):
+        throttles = super().get_throttles()
+        scope = self.get_throttle_scope()
+        if scope is not None:
+            throttles.append(ActionBucketThrottle(scope))
+        return throttles
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        scope = self.get_throttle_scope()
+        if scope is not None and acquire_slot(scope):
+            self.concurrency_scope = scope
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        scope, self.concurrency_scope = self.concurrency_scope, None
+        if scope is not None:
+            if getattr(response, 'streaming', False):
+                # The body of a streaming response is rendered while the
+                # server iterates it, so the slot is held until it closes.
+                response._resource_closers.append(
+                    lambda: release_slot(scope))
+            else:
+                release_slot(scope)
+        return super().finalize_response(request, response, *args, **kwargs)
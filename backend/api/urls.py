@@ -1,14 +1,18 @@
-from api.views import IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet
+from api.async_views import AsyncRouter
+from api.views import (IngredientViewSet, MetricsView, RecipeViewSet,
+                       TagViewSet, UserViewSet)
+from django.conf import settings
 from django.urls import include, path, re_path
 from rest_framework.routers import DefaultRouter
 
-router = DefaultRouter()
+router = AsyncRouter() if settings.ASYNC_VIEWS else DefaultRouter()
 router.register('users', UserViewSet)
 router.register('recipes', RecipeViewSet)
 router.register('tags', TagViewSet)
 router.register('ingredients', IngredientViewSet)
 
 urlpatterns = [
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     path('', include(router.urls)),
     re_path(r'auth/', include('djoser.urls.authtoken')),
 ]
@@ -1,33 +1,60 @@
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db.models import F, Prefetch, Value
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import filters, mixins, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
 
+from api.async_views import AsyncViewSetMixin
+from api.cache import CatalogCacheMixin, ConditionalResponseMixin
 from api.filters import IngredientSearchFilter, RecipeFilter
+from api.metrics import SerializerTimerMixin, registry
 from api.paginators import BasePaginator
-from api.permissions import IsAuthorOrAdminOrReadOnly
-from api.serializers import (CartSerializer, FavouriteSerializer,
-                             FollowSerializer, IngredientSerializer,
-                             RecipeReadSerializer, RecipeWriteSerializer,
-                             SubscribeSerializer, TagSerializer,
-                             UserSerializer)
-from recipes.models import (Cart, Favourite, Follow, Ingredient,
+from api.permissions import IsAdmin, IsAuthorOrAdminOrReadOnly
+from api.serializers import (FollowSerializer, IngredientSerializer,
+                             RecipeBatchSerializer, RecipeReadSerializer,
+                             RecipesByFollowingSerializer,
+                             RecipeWriteSerializer,
+                             ShoppingListItemSerializer, SubscribeSerializer,
+                             TagSerializer, UserSerializer,
+                             get_sparse_fields)
+from api.shopping_list import SHOPPING_LIST_FORMATS
+from api.throttling import AdmissionControlMixin
+from foodgram.settings import ASYNC_VIEWS, RECIPES_LIMIT
+from recipes.feed import latest_recipes
+from recipes.models import (Cart, Favourite, FeedEntry, Follow, Ingredient,
                             IngredientsInRecipe, Recipe, Tag)
+from recipes.toggles import add_recipes, remove_recipes
 from user.models import CustomUser
 
+TOGGLE_ERRORS = {
+    Favourite: ('Рецепт уже добавлен в избранное', 'Рецепта нет в избранном'),
+    Cart: ('Рецепт уже в списке покупок', 'Рецепта нет в списке покупок'),
+}
 
-class UserViewSet(DjoserUserViewSet):
+
+class UserViewSet(SerializerTimerMixin, ConditionalResponseMixin,
+                  AsyncViewSetMixin, DjoserUserViewSet):
     queryset = CustomUser.objects.all()
     serializer_class = UserSerializer
     filter_backends = (filters.SearchFilter,)
     pagination_class = BasePaginator
     permission_classes = (IsAuthorOrAdminOrReadOnly,)
+    keyset_ordering = ('id',)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        fields, _ = get_sparse_fields(self.request)
+        if fields is None:
+            return queryset
+        return queryset.only(*UserSerializer.get_only_fields(fields))
 
     def get_permissions(self):
         if self.action == 'me':
@@ -59,22 +86,89 @@ class UserViewSet(DjoserUserViewSet):
         serializer_class=FollowSerializer,
     )
     def subscriptions(self, request):
-        follows = CustomUser.objects.filter(following__user=request.user)
+        follows = CustomUser.objects.filter(
+            following__user=request.user
+        ).annotate(is_subscribed=Value(True))
         pages = self.paginate_queryset(follows)
-        serializer = self.get_serializer(pages, many=True)
+        recipes_limit = int(
+            request.query_params.get('recipes_limit', RECIPES_LIMIT)
+        )
+        context = self.get_serializer_context()
+        context['recipes_by_author'] = latest_recipes(
+            Recipe, [author.id for author in pages], recipes_limit
+        )
+        serializer = self.get_serializer(pages, many=True, context=context)
         return self.get_paginated_response(serializer.data)
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(SerializerTimerMixin, AdmissionControlMixin,
+                    ConditionalResponseMixin, CatalogCacheMixin,
+                    AsyncViewSetMixin, ModelViewSet):
     queryset = Recipe.objects.all()
     permission_classes = (IsAuthorOrAdminOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     pagination_class = BasePaginator
     filterset_class = RecipeFilter
     serializer_class = RecipeWriteSerializer
+    keyset_ordering = ('-pub_date', '-id')
+    feed_keyset_ordering = ('-pub_date', '-recipe_id')
+    cached_actions = ('retrieve',)
+    cache_anonymous_only = True
+    throttle_scopes = {
+        'create': 'recipe_write',
+        'update': 'recipe_write',
+        'partial_update': 'recipe_write',
+        'favorite_batch': 'recipe_batch',
+        'shopping_cart_batch': 'recipe_batch',
+        'download_shopping_cart': 'shopping_list',
+    }
+
+    def get_sparse_fields(self):
+        if self.action not in ('list', 'retrieve', 'feed'):
+            return None, set()
+        return get_sparse_fields(self.request)
+
+    def get_prefetch_lookups(self):
+        fields, expand = self.get_sparse_fields()
+        lookups = []
+        if fields is None or ('author' in fields and 'author' in expand):
+            lookups.append('author')
+        # Writes replace the tags with set(), which reads them on its own.
+        if fields is None:
+            with_tags = self.action not in ('update', 'partial_update')
+        else:
+            with_tags = 'tags' in fields
+        if with_tags:
+            lookups.append('tags')
+        if fields is None or 'ingredients' in fields:
+            lookups.append(Prefetch(
+                'ingredients_in_recipe',
+                queryset=IngredientsInRecipe.objects.select_related(
+                    'ingredient'
+                )
+            ))
+        return lookups
+
+    def get_queryset(self):
+        fields, _ = self.get_sparse_fields()
+        if fields is None:
+            queryset = Recipe.objects.defer('search_vector')
+        else:
+            queryset = Recipe.objects.only(
+                *RecipeReadSerializer.get_only_fields(fields),
+                *(field.lstrip('-') for field in self.keyset_ordering)
+            )
+        if self.defer_prefetch:
+            return queryset
+        return queryset.prefetch_related(*self.get_prefetch_lookups())
+
+    def perform_content_negotiation(self, request, force=False):
+        if self.action == 'download_shopping_cart':
+            force = True
+        return super().perform_content_negotiation(request, force)
 
     def get_serializer_class(self):
-        if self.action in ('list', 'retrieve'):
+        if self.action in ('list', 'retrieve', 'feed'):
             return RecipeReadSerializer
         return super().get_serializer_class()
 
@@ -82,23 +176,40 @@ class RecipeViewSet(ModelViewSet):
         serializer.save(author=self.request.user)
 
     def add_object(self, model, user, pk):
-        recipe = self.get_object()
-        serializer = self.get_serializer(data={'recipe': recipe.id,
-                                               'user': self.request.user.id})
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+        recipe = get_object_or_404(
+            Recipe.objects.only('id', 'name', 'image', 'image_variants',
+                                'cooking_time'),
+            pk=pk,
+        )
+        if not add_recipes(model, user.id, [recipe.id]):
+            return Response({'errors': TOGGLE_ERRORS[model][0]},
+                            status=status.HTTP_400_BAD_REQUEST)
+        serializer = self.get_serializer(recipe)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete_object(self, model, user, pk):
-        recipe = self.get_object()
-        model.objects.filter(recipe=recipe, user=self.request.user).delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        if remove_recipes(model, user.id, [pk]):
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        get_object_or_404(Recipe.objects.only('id'), pk=pk)
+        return Response({'errors': TOGGLE_ERRORS[model][1]},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    def toggle_objects(self, model, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user_id = request.user.id
+        return Response({
+            'added': add_recipes(model, user_id,
+                                 serializer.validated_data['add']),
+            'removed': remove_recipes(model, user_id,
+                                      serializer.validated_data['remove']),
+        })
 
     @action(
         detail=True,
         methods=['POST', 'DELETE'],
         permission_classes=[IsAuthenticated, ],
-        serializer_class=FavouriteSerializer
+        serializer_class=RecipesByFollowingSerializer
     )
     def favorite(self, request, pk):
         if request.method == 'POST':
@@ -109,40 +220,108 @@ class RecipeViewSet(ModelViewSet):
         detail=True,
         methods=['POST', 'DELETE'],
         permission_classes=[IsAuthenticated, ],
-        serializer_class=CartSerializer
+        serializer_class=RecipesByFollowingSerializer
     )
     def shopping_cart(self, request, pk):
         if request.method == 'POST':
             return self.add_object(Cart, request.user, pk)
         return self.delete_object(Cart, request.user, pk)
 
+    @action(
+        detail=False,
+        methods=['POST'],
+        url_path='favorite',
+        permission_classes=[IsAuthenticated, ],
+        serializer_class=RecipeBatchSerializer
+    )
+    def favorite_batch(self, request):
+        return self.toggle_objects(Favourite, request)
+
+    @action(
+        detail=False,
+        methods=['POST'],
+        url_path='shopping_cart',
+        permission_classes=[IsAuthenticated, ],
+        serializer_class=RecipeBatchSerializer
+    )
+    def shopping_cart_batch(self, request):
+        return self.toggle_objects(Cart, request)
+
+    @action(
+        detail=False,
+        methods=['GET'],
+        permission_classes=[IsAuthenticated]
+    )
+    def feed(self, request):
+        entries = FeedEntry.objects.filter(user=request.user).only(
+            'id', 'recipe_id', 'pub_date'
+        ).order_by(*self.feed_keyset_ordering)
+        recipes = self.filter_queryset(Recipe.objects.all())
+        if recipes.query.has_filters():
+            entries = entries.filter(recipe__in=recipes.values('pk'))
+        self.paginator.keyset_ordering = self.feed_keyset_ordering
+        page = self.paginate_queryset(entries)
+        recipes = self.get_queryset().in_bulk(
+            [entry.recipe_id for entry in page]
+        )
+        serializer = self.get_serializer(
+            [recipes[entry.recipe_id] for entry in page
+             if entry.recipe_id in recipes],
+            many=True,
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=['GET'],
+        permission_classes=[IsAuthenticated],
+        serializer_class=ShoppingListItemSerializer
+    )
+    def shopping_list(self, request):
+        items = request.user.shopping_list.select_related(
+            'ingredient'
+        ).order_by('ingredient__name', 'ingredient__measurement_unit')
+        serializer = self.get_serializer(items, many=True)
+        return Response(serializer.data)
+
     @action(
         detail=False,
         methods=['GET'],
         permission_classes=[IsAuthenticated]
     )
     def download_shopping_cart(self, request):
-        ingredients = IngredientsInRecipe.objects.filter(
-            recipe__shopping_cart__user=request.user
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(total_amount=Sum('amount')).order_by('ingredient__name')
-
-        shopping_list = 'Список покупок:\n'
-        for ingredient in ingredients:
-            shopping_list += (
-                f'{ingredient.get("ingredient__name")}'
-                f' {ingredient.get("total_amount")}'
-                f' {ingredient.get("ingredient__measurement_unit")}\n'
+        export_format = request.query_params.get('format', 'txt')
+        if export_format not in SHOPPING_LIST_FORMATS:
+            return Response(
+                {'format': f'Доступные форматы: '
+                           f'{", ".join(SHOPPING_LIST_FORMATS)}'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-        response = HttpResponse(shopping_list, content_type='text/plain')
+        content_type, render = SHOPPING_LIST_FORMATS[export_format]
+        ingredients = request.user.shopping_list.values(
+            'ingredient__name', 'ingredient__measurement_unit'
+        ).annotate(total_amount=F('amount')).order_by(
+            'ingredient__name', 'ingredient__measurement_unit'
+        )
+        # The ASGI handler iterates streaming responses on the event loop,
+        # where the ORM is not allowed, so only there rows are fetched
+        # before streaming.
+        if ASYNC_VIEWS:
+            ingredients = list(ingredients)
+        else:
+            ingredients = ingredients.iterator()
+        response = StreamingHttpResponse(render(ingredients),
+                                         content_type=content_type)
         response['Content-Disposition'] = (
-            'attachment; filename=shopping_cart.txt'
+            f'attachment; filename=shopping_cart.{export_format}'
         )
         return response
 
 
-class TagViewSet(mixins.ListModelMixin,
+class TagViewSet(SerializerTimerMixin,
+                 CatalogCacheMixin,
+                 AsyncViewSetMixin,
+                 mixins.ListModelMixin,
                  mixins.RetrieveModelMixin,
                  viewsets.GenericViewSet):
     queryset = Tag.objects.all()
@@ -150,11 +329,23 @@ class TagViewSet(mixins.ListModelMixin,
     pagination_class = None
 
 
-class IngredientViewSet(mixins.ListModelMixin,
+class IngredientViewSet(SerializerTimerMixin,
+                        CatalogCacheMixin,
+                        AsyncViewSetMixin,
+                        mixins.ListModelMixin,
                         mixins.RetrieveModelMixin,
                         viewsets.GenericViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filter_backends = (IngredientSearchFilter,)
     pagination_class = None
-    search_fields = ('^name',)
+
+
+class MetricsView(APIView):
+    permission_classes = (IsAdmin,)
+
+    def get(self, request):
+        return HttpResponse(
+            registry.render(),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
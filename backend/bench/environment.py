@@ -0,0 +1,62 @@
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.utils import (setup_databases, setup_test_environment,
+                               teardown_databases, teardown_test_environment)
+from rest_framework.authtoken.models import Token
+
+from recipes.images import get_queue
+
+BENCH_IMAGE = 'media/bench.jpg'
+
+DATASET = {
+    'users': 200,
+    'recipes': 2000,
+    'follows': 2000,
+    'favourites': 5000,
+    'carts': 2000,
+}
+
+
+def add_dataset_arguments(parser):
+    for name, default in DATASET.items():
+        parser.add_argument(f'--{name}', type=int, default=default)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--keepdb', action='store_true',
+                        help='Не удалять тестовую базу после запуска')
+
+
+def without_throttling():
+    rates = settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']
+    return {**settings.REST_FRAMEWORK,
+            'DEFAULT_THROTTLE_RATES': dict.fromkeys(rates)}
+
+
+@contextmanager
+def bench_database(keepdb=False):
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False,
+                                 keepdb=keepdb)
+    try:
+        with override_settings(MEDIA_ROOT=tempfile.mkdtemp(),
+                               REQUEST_METRICS={'ENABLED': False},
+                               REST_FRAMEWORK=without_throttling(),
+                               CONCURRENCY_LIMITS={}):
+            try:
+                yield
+            finally:
+                get_queue().drain()
+    finally:
+        teardown_databases(old_config, verbosity=0, keepdb=keepdb)
+        teardown_test_environment()
+
+
+def auth_headers(reader):
+    return {
+        False: {},
+        True: {'HTTP_AUTHORIZATION': (
+            f'Token {Token.objects.get(user=reader).key}'
+        )},
+    }
@@ -0,0 +1,208 @@
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncClient, Client
+
+from api.metrics import RequestStats, current_stats, install_query_recorder
+from bench.environment import (BENCH_IMAGE, DATASET, add_dataset_arguments,
+                               auth_headers, bench_database)
+from bench.scenarios import build_scenarios
+from bench.seed import seed
+
+
+def percentile(values, percent):
+    if not values:
+        return None
+    index = max(0, min(len(values) - 1,
+                       round(percent / 100 * len(values)) - 1))
+    return values[index]
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', '--short', 'HEAD'),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def request_kwargs(scenario, headers):
+    if scenario.payload is None:
+        return headers
+    return {'data': json.dumps(scenario.payload()),
+            'content_type': 'application/json', **headers}
+
+
+def asgi_headers(headers):
+    return {name[len('HTTP_'):]: value for name, value in headers.items()}
+
+
+class Command(BaseCommand):
+    help = ('Заполняет тестовую базу синтетическими данными и измеряет '
+            'производительность основных эндпоинтов API')
+
+    def add_arguments(self, parser):
+        add_dataset_arguments(parser)
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Запросов на сценарий')
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--concurrency', type=int, default=1,
+                            help='Одновременных запросов')
+        parser.add_argument('--scenario', action='append',
+                            help='Запустить только указанные сценарии')
+        parser.add_argument('--baseline',
+                            help='JSON-отчёт другого запуска для сравнения')
+        parser.add_argument('--output', help='Файл для JSON-отчёта')
+
+    def handle(self, *args, **options):
+        with bench_database(options['keepdb']):
+            report = self.run(options)
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                self.compare(report, json.load(file))
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        self.stdout.write(output)
+
+    def run(self, options):
+        rng = random.Random(options['seed'])
+        started = time.perf_counter()
+        reader, _ = seed(options['users'], options['recipes'],
+                         options['follows'], options['favourites'],
+                         options['carts'], BENCH_IMAGE, rng)
+        seed_time = time.perf_counter() - started
+        cache.clear()
+        install_query_recorder()
+        headers = auth_headers(reader)
+        measure = self.measure_asgi if settings.ASYNC_VIEWS else (
+            self.measure_wsgi
+        )
+        results = {}
+        for scenario in build_scenarios(rng):
+            if options['scenario'] and (
+                    scenario.name not in options['scenario']):
+                continue
+            self.stderr.write(f'{scenario.name}...')
+            samples, elapsed = measure(
+                scenario, headers[scenario.authenticated],
+                options['requests'], options['warmup'],
+                options['concurrency'],
+            )
+            results[scenario.name] = self.summarize(samples, elapsed)
+        return {
+            'meta': {
+                'commit': git_commit(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'server_mode': settings.SERVER_MODE,
+                'concurrency': options['concurrency'],
+                'seed': options['seed'],
+                'seed_seconds': round(seed_time, 3),
+                'dataset': {name: options[name] for name in DATASET},
+            },
+            'scenarios': results,
+        }
+
+    def measure_wsgi(self, scenario, headers, requests, warmup,
+                     concurrency):
+        local = threading.local()
+
+        def send(_=None):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+            stats = RequestStats()
+            token = current_stats.set(stats)
+            started = time.perf_counter()
+            try:
+                response = getattr(local.client, scenario.method)(
+                    scenario.url(), **request_kwargs(scenario, headers)
+                )
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            finally:
+                current_stats.reset(token)
+            return (time.perf_counter() - started, stats.queries,
+                    response.status_code)
+
+        for _ in range(warmup):
+            send()
+        started = time.perf_counter()
+        if concurrency > 1:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                samples = list(executor.map(send, range(requests)))
+        else:
+            samples = [send() for _ in range(requests)]
+        return samples, time.perf_counter() - started
+
+    def measure_asgi(self, scenario, headers, requests, warmup,
+                     concurrency):
+        return asyncio.run(self.ameasure(scenario, asgi_headers(headers),
+                                         requests, warmup, concurrency))
+
+    async def ameasure(self, scenario, headers, requests, warmup,
+                       concurrency):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send():
+            async with semaphore:
+                stats = RequestStats()
+                current_stats.set(stats)
+                started = time.perf_counter()
+                response = await getattr(client, scenario.method)(
+                    scenario.url(), **request_kwargs(scenario, headers)
+                )
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                return (time.perf_counter() - started, stats.queries,
+                        response.status_code)
+
+        for _ in range(warmup):
+            await send()
+        started = time.perf_counter()
+        samples = await asyncio.gather(*(send() for _ in range(requests)))
+        return samples, time.perf_counter() - started
+
+    def summarize(self, samples, elapsed):
+        requests = len(samples)
+        latencies = sorted(latency for latency, _, _ in samples)
+        queries = [count for _, count, _ in samples]
+        return {
+            'requests': requests,
+            'errors': sum(status >= 400 for _, _, status in samples),
+            'throughput_rps': round(requests / elapsed, 2),
+            'latency_ms': {
+                name: round(percentile(latencies, percent) * 1000, 3)
+                for name, percent in (('p50', 50), ('p95', 95), ('p99', 99))
+            },
+            'mean_latency_ms': round(sum(latencies) / requests * 1000, 3),
+            'queries_per_request': round(sum(queries) / requests, 2),
+            'max_queries': max(queries),
+        }
+
+    def compare(self, report, baseline):
+        report['meta']['baseline'] = baseline['meta']
+        for name, result in report['scenarios'].items():
+            previous = baseline['scenarios'].get(name)
+            if previous is None:
+                continue
+            result['baseline_throughput_rps'] = previous['throughput_rps']
+            result['speedup'] = round(
+                result['throughput_rps'] / previous['throughput_rps'], 2
+            )
@@ -0,0 +1,85 @@
+import io
+import json
+import random
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.parsers import FastJSONParser, orjson
+from api.renderers import FastJSONRenderer
+from bench.environment import (BENCH_IMAGE, add_dataset_arguments,
+                               auth_headers, bench_database)
+from bench.scenarios import build_scenarios
+from bench.seed import seed
+
+RENDERERS = (('drf', JSONRenderer()), ('fast', FastJSONRenderer()))
+PARSERS = (('drf', JSONParser()), ('fast', FastJSONParser()))
+
+
+def measure(func, number, repeat):
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает стандартные JSON-рендерер и парсер DRF с быстрыми '
+            'на реальной странице рецептов и запросе создания рецепта')
+
+    def add_arguments(self, parser):
+        add_dataset_arguments(parser)
+        parser.add_argument('--limit', type=int, default=24,
+                            help='Рецептов на странице')
+        parser.add_argument('--number', type=int, default=200,
+                            help='Повторов в одном замере')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Количество замеров, берётся лучший')
+
+    def handle(self, *args, **options):
+        with bench_database(options['keepdb']):
+            page, payload = self.load_samples(options)
+        number, repeat = options['number'], options['repeat']
+        results = {
+            'render_recipe_page': {
+                name: measure(lambda: renderer.render(page), number, repeat)
+                for name, renderer in RENDERERS
+            },
+            'parse_recipe_create': {
+                name: measure(
+                    lambda: parser.parse(io.BytesIO(payload),
+                                         'application/json', {}),
+                    number, repeat,
+                )
+                for name, parser in PARSERS
+            },
+        }
+        report = {
+            'meta': {
+                'orjson': getattr(orjson, '__version__', None),
+                'page_bytes': len(JSONRenderer().render(page)),
+                'payload_bytes': len(payload),
+            },
+            'results': {
+                case: {
+                    **{f'{name}_us': round(seconds * 1e6, 1)
+                       for name, seconds in timings.items()},
+                    'speedup': round(timings['drf'] / timings['fast'], 2),
+                }
+                for case, timings in results.items()
+            },
+        }
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+
+    def load_samples(self, options):
+        rng = random.Random(options['seed'])
+        reader, _ = seed(options['users'], options['recipes'],
+                         options['follows'], options['favourites'],
+                         options['carts'], BENCH_IMAGE, rng)
+        response = Client().get(f'/api/recipes/?limit={options["limit"]}',
+                                **auth_headers(reader)[True])
+        page = json.loads(response.content)
+        create = next(scenario for scenario in build_scenarios(rng)
+                      if scenario.name == 'recipe_create')
+        payload = json.dumps(create.payload()).encode('utf-8')
+        return page, payload
@@ -0,0 +1,116 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from bench.environment import (BENCH_IMAGE, add_dataset_arguments,
+                               auth_headers, bench_database)
+from bench.scenarios import build_scenarios
+from bench.seed import seed
+from recipes.models import (Cart, Favourite, FeedEntry, Follow, Ingredient,
+                            IngredientsInRecipe, Recipe, ShoppingListItem)
+from user.models import CustomUser
+
+LARGE_TABLES = {
+    model._meta.db_table for model in (
+        CustomUser, Recipe, Recipe.tags.through, Ingredient,
+        IngredientsInRecipe, Favourite, Cart, Follow, FeedEntry,
+        ShoppingListItem,
+    )
+}
+
+
+def find_seq_scans(plan):
+    if plan.get('Node Type') == 'Seq Scan' and (
+            plan.get('Relation Name') in LARGE_TABLES):
+        yield plan['Relation Name']
+    for child in plan.get('Plans', ()):
+        yield from find_seq_scans(child)
+
+
+class Command(BaseCommand):
+    help = ('Выполняет EXPLAIN для SQL-запросов основных эндпоинтов на '
+            'заполненной базе с настройками планировщика по умолчанию и '
+            'завершается с ошибкой, если на больших таблицах остаётся '
+            'последовательное сканирование. Для таких запросов выводится '
+            'и план с enable_seqscan = off')
+
+    def add_arguments(self, parser):
+        add_dataset_arguments(parser)
+        parser.add_argument('--verbose-plans', action='store_true',
+                            help='Печатать планы всех запросов')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Проверка планов запросов поддерживается '
+                               'только для PostgreSQL')
+        with bench_database(options['keepdb']):
+            problems = self.run(options)
+        if problems:
+            for scenario, table, sql, plan, forced in problems:
+                if table in set(find_seq_scans(forced)):
+                    note = 'подходящего индекса нет'
+                else:
+                    note = (f'планировщик выбрал Seq Scan: стоимость '
+                            f'{plan["Total Cost"]} против '
+                            f'{forced["Total Cost"]} по индексу')
+                self.stderr.write(
+                    f'{scenario}: Seq Scan on {table} ({note})\n{sql}\n'
+                )
+            raise CommandError(
+                f'Последовательное сканирование в {len(problems)} запросах'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'Последовательных сканирований больших таблиц не найдено'
+        ))
+
+    def run(self, options):
+        rng = random.Random(options['seed'])
+        reader, _ = seed(options['users'], options['recipes'],
+                         options['follows'], options['favourites'],
+                         options['carts'], BENCH_IMAGE, rng)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        client, headers = Client(), auth_headers(reader)
+        problems = []
+        for scenario in build_scenarios(rng):
+            if scenario.method != 'get':
+                continue
+            with CaptureQueriesContext(connection) as context:
+                response = client.get(scenario.url(),
+                                      **headers[scenario.authenticated])
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            for query in context.captured_queries:
+                sql = query['sql']
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                plan = self.explain(sql)
+                tables = set(find_seq_scans(plan))
+                forced = self.explain(sql, seqscan=False) if tables else None
+                if options['verbose_plans']:
+                    self.stdout.write(f'{scenario.name}: {sql}\n'
+                                      f'{json.dumps(plan, indent=2)}')
+                    if forced is not None:
+                        self.stdout.write(f'enable_seqscan = off:\n'
+                                          f'{json.dumps(forced, indent=2)}')
+                problems.extend((scenario.name, table, sql, plan, forced)
+                                for table in sorted(tables))
+        return problems
+
+    def explain(self, sql, seqscan=True):
+        with connection.cursor() as cursor:
+            if not seqscan:
+                cursor.execute('SET enable_seqscan = off')
+            try:
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+                plan = cursor.fetchone()[0]
+            finally:
+                if not seqscan:
+                    cursor.execute('RESET enable_seqscan')
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]['Plan']
@@ -0,0 +1,76 @@
+import base64
+import io
+import random
+from collections import namedtuple
+
+from PIL import Image
+from recipes.models import Ingredient, Recipe, Tag
+
+PAGE_SIZE = 6
+
+Scenario = namedtuple('Scenario',
+                      ('name', 'authenticated', 'method', 'url', 'payload'))
+
+
+def make_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (800, 600), (230, 120, 40)).save(buffer, 'JPEG')
+    return ('data:image/jpeg;base64,'
+            + base64.b64encode(buffer.getvalue()).decode('ascii'))
+
+
+def build_scenarios(rng=None):
+    rng = rng or random.Random(0)
+    recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+    tags = list(Tag.objects.values_list('id', 'slug'))
+    ingredients = list(Ingredient.objects.values_list('id', 'name'))
+    pages = max(1, len(recipe_ids) // PAGE_SIZE)
+    image = make_image()
+
+    def recipe_payload():
+        return {
+            'name': 'Бенчмарк',
+            'text': 'Описание рецепта',
+            'cooking_time': 30,
+            'image': image,
+            'tags': [tag_id for tag_id, _ in tags[:2]],
+            'ingredients': [
+                {'id': ingredient_id, 'amount': rng.randint(1, 500)}
+                for ingredient_id, _ in rng.sample(ingredients, 10)
+            ],
+        }
+
+    return (
+        Scenario('recipe_list', False, 'get',
+                 lambda: f'/api/recipes/?limit={PAGE_SIZE}', None),
+        Scenario('recipe_list_deep', False, 'get',
+                 lambda: (f'/api/recipes/?limit={PAGE_SIZE}'
+                          f'&page={rng.randint(1, pages)}'),
+                 None),
+        Scenario('recipe_list_tags', False, 'get',
+                 lambda: (f'/api/recipes/?tags={tags[0][1]}'
+                          f'&tags={tags[1][1]}'),
+                 None),
+        Scenario('recipe_list_favorited', True, 'get',
+                 lambda: '/api/recipes/?is_favorited=1', None),
+        Scenario('recipe_list_authenticated', True, 'get',
+                 lambda: f'/api/recipes/?limit={PAGE_SIZE}', None),
+        Scenario('recipe_detail', False, 'get',
+                 lambda: f'/api/recipes/{rng.choice(recipe_ids)}/', None),
+        Scenario('recipe_detail_authenticated', True, 'get',
+                 lambda: f'/api/recipes/{rng.choice(recipe_ids)}/', None),
+        Scenario('subscriptions', True, 'get',
+                 lambda: '/api/users/subscriptions/?recipes_limit=3', None),
+        Scenario('feed', True, 'get',
+                 lambda: f'/api/recipes/feed/?limit={PAGE_SIZE}', None),
+        Scenario('ingredient_search', False, 'get',
+                 lambda: ('/api/ingredients/?name='
+                          + rng.choice(ingredients)[1][:3]),
+                 None),
+        Scenario('shopping_list', True, 'get',
+                 lambda: '/api/recipes/shopping_list/', None),
+        Scenario('shopping_cart_download', True, 'get',
+                 lambda: '/api/recipes/download_shopping_cart/', None),
+        Scenario('recipe_create', True, 'post',
+                 lambda: '/api/recipes/', recipe_payload),
+    )
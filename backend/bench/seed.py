@@ -0,0 +1,123 @@
+import csv
+import random
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from recipes import feed, search, shopping_list
+from recipes.counters import recount
+from recipes.models import (Cart, Favourite, FeedEntry, Follow, Ingredient,
+                            IngredientsInRecipe, Recipe, ShoppingListItem,
+                            Tag)
+from rest_framework.authtoken.models import Token
+from user.models import CustomUser
+
+BATCH_SIZE = 1000
+TAGS = (
+    ('Завтрак', 'breakfast', '#E26C2D'),
+    ('Обед', 'lunch', '#49B64E'),
+    ('Ужин', 'dinner', '#8775D2'),
+)
+PASSWORD = 'bench-password'
+
+
+def load_ingredients():
+    if Ingredient.objects.exists():
+        return list(Ingredient.objects.values_list('id', flat=True))
+    with open(f'{settings.BASE_DIR}/data/ingredients.csv',
+              encoding='utf-8') as csv_file:
+        Ingredient.objects.bulk_create(
+            (Ingredient(**row) for row in csv.DictReader(csv_file)),
+            batch_size=BATCH_SIZE,
+        )
+    return list(Ingredient.objects.values_list('id', flat=True))
+
+
+@transaction.atomic
+def seed(users, recipes, follows, favourites, carts, image, rng=None):
+    rng = rng or random.Random(0)
+    ingredient_ids = load_ingredients()
+    tags = [Tag.objects.get_or_create(slug=slug, defaults={
+        'name': name, 'color': color
+    })[0] for name, slug, color in TAGS]
+
+    password = make_password(None)
+    CustomUser.objects.bulk_create(
+        (CustomUser(username=f'bench{index}',
+                    email=f'bench{index}@example.com',
+                    first_name='Bench', last_name=str(index),
+                    password=password)
+         for index in range(users)),
+        batch_size=BATCH_SIZE,
+    )
+    authors = list(CustomUser.objects.filter(
+        username__startswith='bench'
+    ).order_by('id'))
+    reader = authors[0]
+    reader.set_password(PASSWORD)
+    reader.save(update_fields=['password'])
+    Token.objects.get_or_create(user=reader)
+
+    Recipe.objects.bulk_create(
+        (Recipe(name=f'Рецепт {index}', text='Описание рецепта ' * 20,
+                cooking_time=rng.randint(5, 120),
+                author=rng.choice(authors), image=image,
+                image_variants={'source': image})
+         for index in range(recipes)),
+        batch_size=BATCH_SIZE,
+    )
+    created = list(Recipe.objects.filter(
+        author__username__startswith='bench'
+    ).order_by('id'))
+    IngredientsInRecipe.objects.bulk_create(
+        (IngredientsInRecipe(recipe=recipe, ingredient_id=ingredient_id,
+                             amount=rng.randint(1, 500))
+         for recipe in created
+         for ingredient_id in rng.sample(ingredient_ids,
+                                         rng.randint(3, 15))),
+        batch_size=BATCH_SIZE,
+    )
+    Recipe.tags.through.objects.bulk_create(
+        (Recipe.tags.through(recipe=recipe, tag=tag)
+         for recipe in created
+         for tag in rng.sample(tags, rng.randint(1, len(tags)))),
+        batch_size=BATCH_SIZE,
+    )
+
+    def pairs(count, left, right, exclude_self=False):
+        seen = set()
+        attempts = 0
+        while len(seen) < count and attempts < count * 10:
+            attempts += 1
+            pair = (rng.choice(left), rng.choice(right))
+            if exclude_self and pair[0] == pair[1]:
+                continue
+            seen.add(pair)
+        return seen
+
+    readers = [reader] + authors[1:]
+    Follow.objects.bulk_create(
+        (Follow(user=user, author=author)
+         for user, author in pairs(follows, readers, authors, True)),
+        batch_size=BATCH_SIZE,
+    )
+    Favourite.objects.bulk_create(
+        (Favourite(user=user, recipe=recipe)
+         for user, recipe in pairs(favourites, readers, created)),
+        batch_size=BATCH_SIZE,
+    )
+    Cart.objects.bulk_create(
+        (Cart(user=user, recipe=recipe)
+         for user, recipe in pairs(carts, readers, created)),
+        batch_size=BATCH_SIZE,
+    )
+    for recipe in rng.sample(created, min(len(created), 30)):
+        Favourite.objects.get_or_create(user=reader, recipe=recipe)
+        Cart.objects.get_or_create(user=reader, recipe=recipe)
+    for author in rng.sample(authors[1:], min(len(authors) - 1, 20)):
+        Follow.objects.get_or_create(user=reader, author=author)
+    recount(Recipe, CustomUser, Favourite, Cart, Follow)
+    feed.rebuild(FeedEntry, Recipe, Follow, settings.FEED_BACKFILL_LIMIT)
+    shopping_list.rebuild(ShoppingListItem, Cart)
+    search.rebuild(Recipe, IngredientsInRecipe)
+    return reader, tags
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class FoodgramConfig(AppConfig):
+    name = 'foodgram'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from foodgram.connections import count_connect
+        connection_created.connect(count_connect)
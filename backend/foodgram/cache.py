@@ -0,0 +1,34 @@
+import time
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+CATALOG_VERSION_KEY = 'api:catalog:version'
+
+
+def is_shared(alias=DEFAULT_CACHE_ALIAS):
+    # Every worker process has its own local memory cache, so an entry
+    # invalidated in one of them keeps being served by the others.
+    return not isinstance(caches[alias], (LocMemCache, DummyCache))
+
+
+def get_catalog_version():
+    return cache.get_or_set(CATALOG_VERSION_KEY, time.time, timeout=None)
+
+
+def bump_catalog_version():
+    cache.set(CATALOG_VERSION_KEY, time.time(), timeout=None)
+
+
+def invalidate_catalog(**kwargs):
+    transaction.on_commit(bump_catalog_version)
+
+
+def invalidate_author(created=False, update_fields=None, **kwargs):
+    # Recipes embed their author; a login only touches last_login.
+    if created or (update_fields is not None
+                   and set(update_fields) == {'last_login'}):
+        return
+    invalidate_catalog()
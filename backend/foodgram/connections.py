@@ -0,0 +1,88 @@
+import threading
+
+from django.conf import settings
+from django.core.checks import Error, Warning, register
+
+from foodgram.postgresql_pool.pool import pools
+
+POOL_ENGINE = 'foodgram.postgresql_pool'
+
+lock = threading.Lock()
+connects = {}
+health_check_failures = {}
+
+
+def count_connect(sender, connection, **kwargs):
+    with lock:
+        connects[connection.alias] = connects.get(connection.alias, 0) + 1
+
+
+def count_health_check_failure(alias):
+    with lock:
+        health_check_failures[alias] = health_check_failures.get(alias, 0) + 1
+
+
+class HealthCheckMixin:
+    # A reused connection is pinged the first time a request touches it,
+    # in whichever thread that happens. close_old_connections() marks it
+    # for a new check at every request boundary, including the worker
+    # threads of the async views.
+    health_check_done = False
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def ensure_connection(self):
+        if (self.connection is not None and not self.health_check_done
+                and not self.in_atomic_block):
+            self.health_check_done = True
+            if (self.settings_dict.get('CONN_HEALTH_CHECKS')
+                    and not self.is_usable()):
+                count_health_check_failure(self.alias)
+                self.close()
+        super().ensure_connection()
+
+
+def connection_stats():
+    stats = {}
+    for alias, settings_dict in settings.DATABASES.items():
+        with lock:
+            alias_stats = {
+                'conn_max_age': settings_dict.get('CONN_MAX_AGE', 0) or 0,
+                'connects': connects.get(alias, 0),
+                'health_check_failures': health_check_failures.get(alias, 0),
+            }
+        if alias in pools:
+            alias_stats.update(
+                (f'pool_{name}', value)
+                for name, value in pools[alias].stats().items()
+            )
+        stats[alias] = alias_stats
+    return stats
+
+
+@register('connections')
+def check_connection_settings(app_configs, **kwargs):
+    errors = []
+    for alias, settings_dict in settings.DATABASES.items():
+        if settings_dict['ENGINE'] != POOL_ENGINE:
+            continue
+        if settings_dict.get('CONN_MAX_AGE'):
+            errors.append(Warning(
+                f'{alias}: CONN_MAX_AGE не используется вместе с пулом '
+                f'соединений',
+                hint='Пул сам хранит соединения между запросами, '
+                     'установите CONN_MAX_AGE=0.',
+                id='foodgram.W001',
+            ))
+        if settings_dict.get('POOL', {}).get('MAX_SIZE', 10) < 1:
+            errors.append(Error(
+                f'{alias}: размер пула соединений должен быть больше нуля',
+                id='foodgram.E001',
+            ))
+    return errors
@@ -0,0 +1,17 @@
+class CounterFieldsMixin:
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        # Counters are only changed with F() updates; a full save would
+        # write back whatever stale value the instance was loaded with.
+        if (not self._state.adding and not args
+                and not kwargs.get('force_insert')
+                and kwargs.get('update_fields') is None):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
@@ -0,0 +1,24 @@
+from django.db.backends.postgresql import base
+
+from foodgram.postgresql_pool.pool import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_pool(self):
+        return get_pool(self.alias, self.settings_dict)
+
+    def get_new_connection(self, conn_params):
+        connection = self.get_pool().checkout(
+            lambda: super(DatabaseWrapper, self).get_new_connection(
+                conn_params
+            )
+        )
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level', connection.isolation_level
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.get_pool().checkin(self.connection)
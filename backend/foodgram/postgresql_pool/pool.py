@@ -0,0 +1,115 @@
+import logging
+import threading
+
+from psycopg2 import OperationalError
+from psycopg2.extensions import (TRANSACTION_STATUS_IDLE,
+                                 TRANSACTION_STATUS_UNKNOWN)
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    def __init__(self, alias, max_size, timeout, health_checks):
+        self.alias = alias
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_checks = health_checks
+        self.slots = threading.BoundedSemaphore(max_size)
+        self.lock = threading.Lock()
+        self.idle = []
+        self.size = 0
+        self.opened = 0
+        self.discarded = 0
+        self.timeouts = 0
+        logger.info('Пул соединений %s: до %d соединений, ожидание %s с',
+                    alias, max_size, timeout)
+
+    def checkout(self, connect):
+        if not self.slots.acquire(timeout=self.timeout):
+            with self.lock:
+                self.timeouts += 1
+            raise OperationalError(
+                f'Пул соединений {self.alias} исчерпан: все {self.max_size} '
+                f'соединений заняты дольше {self.timeout} с'
+            )
+        try:
+            while True:
+                with self.lock:
+                    connection = self.idle.pop() if self.idle else None
+                if connection is None:
+                    connection = connect()
+                    with self.lock:
+                        self.size += 1
+                        self.opened += 1
+                    return connection
+                if self.is_usable(connection):
+                    return connection
+                self.discard(connection)
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def checkin(self, connection):
+        try:
+            status = connection.info.transaction_status
+            if connection.closed or status == TRANSACTION_STATUS_UNKNOWN:
+                self.discard(connection)
+                return
+            if status != TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+            with self.lock:
+                self.idle.append(connection)
+        except Exception:
+            self.discard(connection)
+        finally:
+            self.slots.release()
+
+    def is_usable(self, connection):
+        if connection.closed:
+            return False
+        if not self.health_checks:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except Exception:
+            return False
+        return True
+
+    def discard(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self.lock:
+            self.size -= 1
+            self.discarded += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                'max_size': self.max_size,
+                'open': self.size,
+                'idle': len(self.idle),
+                'used': self.size - len(self.idle),
+                'opened': self.opened,
+                'discarded': self.discarded,
+                'timeouts': self.timeouts,
+            }
+
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+def get_pool(alias, settings_dict):
+    with pools_lock:
+        if alias not in pools:
+            options = settings_dict.get('POOL', {})
+            pools[alias] = ConnectionPool(
+                alias,
+                max_size=options.get('MAX_SIZE', 10),
+                timeout=options.get('TIMEOUT', 5),
+                health_checks=settings_dict.get('CONN_HEALTH_CHECKS', False),
+            )
+        return pools[alias]
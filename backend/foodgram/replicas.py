@@ -0,0 +1,139 @@
+import asyncio
+import hashlib
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+read_alias = ContextVar('read_alias', default=None)
+
+lock = threading.Lock()
+down_until = {}
+
+
+def get_replicas():
+    return [alias for alias in settings.DATABASES
+            if alias != DEFAULT_DB_ALIAS]
+
+
+def mark_down(alias):
+    with lock:
+        down_until[alias] = time.monotonic() + settings.DB_REPLICA_RETRY
+    logger.warning('Реплика %s недоступна, чтение переключено на основную '
+                   'базу на %d с', alias, settings.DB_REPLICA_RETRY)
+
+
+def is_down(alias):
+    with lock:
+        return down_until.get(alias, 0) > time.monotonic()
+
+
+def choose_replica():
+    replicas = [alias for alias in get_replicas() if not is_down(alias)]
+    random.shuffle(replicas)
+    for alias in replicas:
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError:
+            mark_down(alias)
+            continue
+        return alias
+    return DEFAULT_DB_ALIAS
+
+
+def get_sticky_key(credentials):
+    digest = hashlib.md5(credentials.encode('utf-8')).hexdigest()
+    return f'replicas:sticky:{digest}'
+
+
+def get_credentials(request):
+    return request.META.get('HTTP_AUTHORIZATION') or (
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    )
+
+
+def get_issued_credentials(response):
+    # Token login answers before the client has any credentials, so pin
+    # the token it is about to send in its Authorization header.
+    data = getattr(response, 'data', None)
+    if isinstance(data, dict) and data.get('auth_token'):
+        return f'Token {data["auth_token"]}'
+    return None
+
+
+def is_sticky(request):
+    credentials = get_credentials(request)
+    return (credentials is not None
+            and cache.get(get_sticky_key(credentials)) is not None)
+
+
+def make_sticky(credentials):
+    if credentials:
+        cache.set(get_sticky_key(credentials), True,
+                  settings.DB_REPLICA_STICKINESS)
+
+
+def choose_alias(request):
+    if request.method not in SAFE_METHODS or is_sticky(request):
+        return DEFAULT_DB_ALIAS
+    return choose_replica()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not get_replicas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        token = read_alias.set(choose_alias(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            read_alias.reset(token)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        alias = await sync_to_async(choose_alias,
+                                    thread_sensitive=False)(request)
+        token = read_alias.set(alias)
+        try:
+            response = await self.get_response(request)
+        finally:
+            read_alias.reset(token)
+        return self.process_response(request, response)
+
+    def process_response(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            make_sticky(get_credentials(request))
+            make_sticky(get_issued_credentials(response))
+        return response
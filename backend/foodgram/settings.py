@@ -25,9 +25,13 @@ INSTALLED_APPS = [
     'foodgram',
     'recipes',
     'user',
+    'bench',
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
+    'foodgram.replicas.ReplicaMiddleware',
+    'api.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -64,8 +68,35 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
-    ]
+        'api.authentication.CachedTokenAuthentication',
+    ],
+    'EXCEPTION_HANDLER': 'api.throttling.exception_handler',
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.AnonBucketThrottle',
+        'api.throttling.UserBucketThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'anon': os.getenv('THROTTLE_ANON_RATE', '120/minute') or None,
+        'user': os.getenv('THROTTLE_USER_RATE', '600/minute') or None,
+        'recipe_write': os.getenv(
+            'THROTTLE_RECIPE_WRITE_RATE', '20/minute'
+        ) or None,
+        'recipe_batch': os.getenv(
+            'THROTTLE_RECIPE_BATCH_RATE', '30/minute'
+        ) or None,
+        'shopping_list': os.getenv(
+            'THROTTLE_SHOPPING_LIST_RATE', '10/minute'
+        ) or None,
+    },
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 DJOSER = {
@@ -78,11 +109,17 @@ DJOSER = {
         'user': 'api.serializers.UserSerializer',
         'user_list': 'api.serializers.UserSerializer',
         'current_user': 'api.serializers.UserSerializer',
-        'user_create': 'api.serializers.UserCreateSerializer'
+        'user_create': 'api.serializers.UserCreateSerializer',
+        'token': 'api.serializers.TokenSerializer',
     },
 }
 APPEND_SLASH = False
 
+REQUEST_METRICS = {
+    'ENABLED': os.getenv('REQUEST_METRICS', 'True').lower() == 'true',
+    'QUERY_BUDGET': int(os.getenv('QUERY_BUDGET', 20)),
+}
+
 
 AUTH_USER_MODEL = 'user.CustomUser'
 
@@ -92,14 +129,58 @@ WSGI_APPLICATION = 'foodgram.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+DB_POOL = os.getenv('DB_POOL', 'False').lower() == 'true'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': ('foodgram.postgresql_pool' if DB_POOL
+                   else 'foodgram.postgresql'),
         'NAME': os.getenv('POSTGRES_DB', 'django'),
         'USER': os.getenv('POSTGRES_USER', 'django_user'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': 0 if DB_POOL else int(
+            os.getenv('DB_CONN_MAX_AGE', 60)
+        ),
+        'CONN_HEALTH_CHECKS': os.getenv(
+            'DB_CONN_HEALTH_CHECKS', 'True'
+        ).lower() == 'true',
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv(
+            'DB_PGBOUNCER', 'False'
+        ).lower() == 'true',
+        'POOL': {
+            'MAX_SIZE': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 5)),
+        },
+    }
+}
+
+DB_REPLICA_HOSTS = [
+    host for host in os.getenv('DB_REPLICA_HOSTS', '').split(',') if host
+]
+
+for index, replica in enumerate(DB_REPLICA_HOSTS, start=1):
+    host, _, port = replica.partition(':')
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['foodgram.replicas.ReplicaRouter']
+
+DB_REPLICA_STICKINESS = int(os.getenv('DB_REPLICA_STICKINESS', 10))
+
+DB_REPLICA_RETRY = int(os.getenv('DB_REPLICA_RETRY', 30))
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     }
 }
 
@@ -152,4 +233,49 @@ MEDIA_URL = '/media/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+
+ASYNC_VIEWS = SERVER_MODE == 'asgi'
+
 RECIPES_LIMIT = 3
+
+RECIPES_BATCH_LIMIT = 100
+
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 100))
+
+THROTTLE_CACHE = os.getenv('THROTTLE_CACHE', 'default')
+
+CONCURRENCY_LIMITS = {
+    'recipe_write': int(os.getenv('CONCURRENCY_RECIPE_WRITE', 4)),
+    'shopping_list': int(os.getenv('CONCURRENCY_SHOPPING_LIST', 4)),
+}
+
+CONCURRENCY_SLOT_TIMEOUT = int(os.getenv('CONCURRENCY_SLOT_TIMEOUT', 120))
+
+CONCURRENCY_RETRY_AFTER = int(os.getenv('CONCURRENCY_RETRY_AFTER', 5))
+
+FEED_BACKFILL_LIMIT = int(os.getenv('FEED_BACKFILL_LIMIT', 100))
+
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', 300))
+
+RELATIONS_CACHE_TIMEOUT = int(os.getenv('RELATIONS_CACHE_TIMEOUT', 3600))
+
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.getenv('AUTH_TOKEN_CACHE_TIMEOUT', 60))
+
+AUTH_SIGNED_TOKENS = os.getenv('AUTH_SIGNED_TOKENS', 'False').lower() == 'true'
+
+AUTH_SIGNED_TOKEN_MAX_AGE = int(os.getenv('AUTH_SIGNED_TOKEN_MAX_AGE', 0))
+
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', 20))
+
+IMAGE_PROCESSING_QUEUE = os.getenv(
+    'IMAGE_PROCESSING_QUEUE', 'recipes.images.ThreadPoolQueue'
+)
+
+IMAGE_PROCESSING_WORKERS = int(os.getenv('IMAGE_PROCESSING_WORKERS', 2))
+
+SHOPPING_LIST_FONT = os.getenv(
+    'SHOPPING_LIST_FONT', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
@@ -0,0 +1,10 @@
+import os
+
+bind = '0.0.0.0:8099'
+workers = int(os.getenv('GUNICORN_WORKERS', 3))
+
+if os.getenv('SERVER_MODE', 'wsgi') == 'asgi':
+    wsgi_app = 'foodgram.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'foodgram.wsgi:application'
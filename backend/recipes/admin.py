@@ -37,7 +37,9 @@ class CartAdmin(admin.ModelAdmin):
 
 
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('id', 'author', 'name')
+    list_display = ('id', 'author', 'name', 'favourites_count',
+                    'carts_count')
+    readonly_fields = ('favourites_count', 'carts_count')
     search_fields = ('name',)
     list_filter = ('author', 'name', 'tags')
     empty_value_display = '-пусто-'
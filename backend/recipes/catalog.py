@@ -0,0 +1,124 @@
+import csv
+import io
+import json
+import os
+from itertools import islice
+
+from django.db import connection
+
+FIELDS = ('name', 'measurement_unit')
+
+
+def read_csv(path):
+    with open(path, encoding='utf-8', newline='') as source:
+        yield from csv.DictReader(source)
+
+
+def read_json(path, chunk_size=64 * 1024):
+    # Decodes the top-level array item by item instead of loading the whole
+    # document, so large catalogs stream just like CSV does.
+    decoder = json.JSONDecoder()
+    with open(path, encoding='utf-8') as source:
+        buffer = source.read(chunk_size).lstrip()
+        if not buffer.startswith('['):
+            raise ValueError(f'Ожидается JSON-массив: {path}')
+        buffer = buffer[1:]
+        while True:
+            buffer = buffer.lstrip()
+            if buffer.startswith(','):
+                buffer = buffer[1:].lstrip()
+            if buffer.startswith(']'):
+                return
+            try:
+                row, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    raise
+                buffer += chunk
+                continue
+            yield row
+            buffer = buffer[end:]
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+}
+
+
+def read_rows(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in READERS:
+        raise ValueError(f'Неподдерживаемый формат файла: {path}')
+    return READERS[extension](path)
+
+
+def batched(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def clean_rows(model, rows, stats):
+    limits = [model._meta.get_field(field).max_length for field in FIELDS]
+    for row in rows:
+        values = tuple(str(row.get(field) or '').strip() for field in FIELDS)
+        if all(values) and all(
+                len(value) <= limit for value, limit in zip(values, limits)):
+            yield values
+        else:
+            stats['invalid'] += 1
+
+
+def copy_rows(model, batches, stats):
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TEMPORARY TABLE ingredient_import '
+            '(name text, measurement_unit text)'
+        )
+        for batch in batches:
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(batch)
+            buffer.seek(0)
+            cursor.copy_expert(
+                'COPY ingredient_import FROM STDIN WITH (FORMAT csv)', buffer
+            )
+            stats['read'] += len(batch)
+        cursor.execute(
+            f'INSERT INTO {table} (name, measurement_unit) '
+            f'SELECT DISTINCT name, measurement_unit FROM ingredient_import '
+            f'ON CONFLICT (name, measurement_unit) DO NOTHING'
+        )
+        stats['inserted'] = cursor.rowcount
+        cursor.execute('DROP TABLE ingredient_import')
+
+
+def create_rows(model, batches, stats):
+    before = model.objects.count()
+    seen = set()
+    for batch in batches:
+        stats['read'] += len(batch)
+        new = [values for values in batch if values not in seen]
+        seen.update(new)
+        model.objects.bulk_create(
+            (model(**dict(zip(FIELDS, values))) for values in new),
+            batch_size=len(batch),
+            ignore_conflicts=True,
+        )
+    stats['inserted'] = model.objects.count() - before
+
+
+def import_ingredients(model, rows, batch_size):
+    stats = {'read': 0, 'inserted': 0, 'skipped': 0, 'invalid': 0}
+    batches = batched(clean_rows(model, rows, stats), batch_size)
+    if connection.vendor == 'postgresql':
+        copy_rows(model, batches, stats)
+    else:
+        create_rows(model, batches, stats)
+    stats['skipped'] = stats['read'] - stats['inserted']
+    return stats
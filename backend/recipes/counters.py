@@ -0,0 +1,29 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+
+def count_subquery(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field
+        ).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def increment(model, pk, field, delta):
+    value = F(field) + delta
+    if delta < 0:
+        value = Greatest(value, 0)
+    model.objects.filter(pk=pk).update(**{field: value})
+
+
+def recount(recipe_model, user_model, favourite_model, cart_model,
+            follow_model):
+    recipe_model.objects.update(
+        favourites_count=count_subquery(favourite_model, 'recipe'),
+        carts_count=count_subquery(cart_model, 'recipe'),
+    )
+    user_model.objects.update(
+        recipes_count=count_subquery(recipe_model, 'author'),
+        followers_count=count_subquery(follow_model, 'author'),
+    )
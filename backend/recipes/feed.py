@@ -0,0 +1,72 @@
+from collections import defaultdict
+
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+BATCH_SIZE = 1000
+
+
+def latest_recipes(recipe_model, author_ids, limit):
+    if not author_ids or limit <= 0:
+        return {}
+    ranked = recipe_model.objects.filter(author_id__in=author_ids).annotate(
+        row_number=Window(
+            expression=RowNumber(),
+            partition_by=F('author_id'),
+            order_by=(F('pub_date').desc(), F('id').desc()),
+        )
+    ).order_by()
+    sql, params = ranked.query.sql_with_params()
+    recipes = defaultdict(list)
+    for recipe in recipe_model.objects.raw(
+            f'SELECT * FROM ({sql}) ranked WHERE row_number <= %s '
+            f'ORDER BY author_id, row_number', (*params, limit)):
+        recipes[recipe.author_id].append(recipe)
+    return recipes
+
+
+def make_entries(feed_model, user_ids, recipes):
+    return (
+        feed_model(user_id=user_id, recipe_id=recipe.id,
+                   author_id=recipe.author_id, pub_date=recipe.pub_date)
+        for recipe in recipes for user_id in user_ids
+    )
+
+
+def fan_out(feed_model, follow_model, recipe):
+    followers = follow_model.objects.filter(
+        author_id=recipe.author_id
+    ).values_list('user_id', flat=True)
+    feed_model.objects.bulk_create(
+        make_entries(feed_model, followers.iterator(), (recipe,)),
+        batch_size=BATCH_SIZE, ignore_conflicts=True,
+    )
+
+
+def backfill(feed_model, recipe_model, user_id, author_id, limit):
+    recipes = recipe_model.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id'
+    ).only('id', 'author_id', 'pub_date')[:limit]
+    feed_model.objects.bulk_create(
+        make_entries(feed_model, (user_id,), recipes),
+        batch_size=BATCH_SIZE, ignore_conflicts=True,
+    )
+
+
+def prune(feed_model, user_id, author_id):
+    feed_model.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild(feed_model, recipe_model, follow_model, limit):
+    feed_model.objects.all().delete()
+    followers = defaultdict(list)
+    for user_id, author_id in follow_model.objects.values_list(
+            'user_id', 'author_id').iterator():
+        followers[author_id].append(user_id)
+    recipes = latest_recipes(recipe_model, list(followers), limit)
+    feed_model.objects.bulk_create(
+        (entry for author_id, author_recipes in recipes.items()
+         for entry in make_entries(feed_model, followers[author_id],
+                                   author_recipes)),
+        batch_size=BATCH_SIZE,
+    )
@@ -0,0 +1,134 @@
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils.module_loading import import_string
+from PIL import Image, ImageOps
+
+from foodgram.cache import bump_catalog_version
+from recipes.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+VARIANTS = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'full': (1280, 1280),
+}
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+VARIANTS_DIR = 'media/variants'
+
+
+class SyncQueue:
+    def submit(self, func, *args):
+        func(*args)
+
+    def drain(self):
+        pass
+
+
+class ThreadPoolQueue:
+    def __init__(self):
+        self.executor = self.create_executor()
+
+    def create_executor(self):
+        return ThreadPoolExecutor(
+            max_workers=settings.IMAGE_PROCESSING_WORKERS,
+            thread_name_prefix='recipe-images',
+        )
+
+    def drain(self):
+        executor, self.executor = self.executor, self.create_executor()
+        executor.shutdown(wait=True)
+
+    def submit(self, func, *args):
+        self.executor.submit(self.run, func, *args)
+
+    def run(self, func, *args):
+        close_old_connections()
+        try:
+            func(*args)
+        except Exception:
+            logger.exception('Не удалось обработать картинку рецепта')
+        finally:
+            close_old_connections()
+
+
+_queue = None
+
+
+def get_queue():
+    global _queue
+    if _queue is None:
+        _queue = import_string(settings.IMAGE_PROCESSING_QUEUE)()
+    return _queue
+
+
+def render_variants(source):
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        for variant, size in VARIANTS.items():
+            resized = image.copy()
+            resized.thumbnail(size, Image.LANCZOS)
+            for extension, (image_format, options) in FORMATS.items():
+                buffer = io.BytesIO()
+                resized.save(buffer, image_format, **options)
+                yield variant, extension, buffer.getvalue()
+
+
+def delete_variants(variants):
+    for variant, files in variants.items():
+        if variant == 'source':
+            continue
+        for name in files.values():
+            default_storage.delete(name)
+
+
+def process_recipe_image(recipe_id, image_name):
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    variants = {'source': image_name}
+    with default_storage.open(image_name, 'rb') as source:
+        for variant, extension, content in render_variants(source):
+            name = default_storage.save(
+                f'{VARIANTS_DIR}/{stem}_{variant}.{extension}',
+                ContentFile(content),
+            )
+            variants.setdefault(variant, {})[extension] = name
+    previous = Recipe.objects.filter(pk=recipe_id).values_list(
+        'image_variants', flat=True
+    ).first()
+    if not Recipe.objects.filter(pk=recipe_id, image=image_name).update(
+            image_variants=variants):
+        # The recipe was deleted or got another image in the meantime.
+        delete_variants(variants)
+        return
+    bump_catalog_version()
+    if previous:
+        delete_variants(previous)
+
+
+def schedule_variants_cleanup(recipe):
+    variants = recipe.image_variants
+    if any(variant != 'source' for variant in variants):
+        transaction.on_commit(
+            lambda: get_queue().submit(delete_variants, variants)
+        )
+
+
+def schedule_image_processing(recipe):
+    if not recipe.image or (
+            recipe.image_variants.get('source') == recipe.image.name):
+        return
+    recipe_id, image_name = recipe.pk, recipe.image.name
+    transaction.on_commit(
+        lambda: get_queue().submit(process_recipe_image,
+                                   recipe_id, image_name)
+    )
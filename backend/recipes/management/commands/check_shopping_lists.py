@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes.models import Cart, ShoppingListItem
+from recipes.shopping_list import find_inconsistent, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Сверяет списки покупок с корзинами пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true',
+                            help='Пересобрать расходящиеся списки')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user_ids = find_inconsistent(ShoppingListItem, Cart)
+            if not user_ids:
+                self.stdout.write(self.style.SUCCESS(
+                    'Списки покупок согласованы'
+                ))
+                return
+            if options['fix']:
+                rebuild(ShoppingListItem, Cart, user_ids)
+                self.stdout.write(self.style.SUCCESS(
+                    f'Пересобрано списков покупок: {len(user_ids)}'
+                ))
+                return
+        self.stdout.write(self.style.WARNING(
+            f'Расходятся списки покупок пользователей: '
+            f'{", ".join(map(str, sorted(user_ids)))}'
+        ))
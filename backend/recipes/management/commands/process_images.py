@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from recipes.images import process_recipe_image
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Создаёт уменьшенные копии картинок рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Пересоздать копии для всех рецептов')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').only(
+            'id', 'image', 'image_variants'
+        )
+        processed = 0
+        for recipe in recipes.iterator():
+            if (not options['all']
+                    and recipe.image_variants.get('source')
+                    == recipe.image.name):
+                continue
+            try:
+                process_recipe_image(recipe.pk, recipe.image.name)
+            except OSError as error:
+                self.stderr.write(f'Рецепт {recipe.pk}: {error}')
+                continue
+            processed += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'Обработано картинок: {processed}')
+        )
@@ -1,23 +1,34 @@
-import csv
-
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from foodgram.cache import bump_catalog_version
+from recipes.catalog import import_ingredients, read_rows
 from recipes.models import Ingredient
 
-OUR_DATABASE = {
-    Ingredient: 'ingredients.csv',
-}
+DEFAULT_PATH = f'{settings.BASE_DIR}/data/ingredients.csv'
 
 
 class Command(BaseCommand):
-    help = 'Загружает список ингредиентов из CSV файлов'
+    help = 'Загружает список ингредиентов из CSV или JSON файлов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', default=[DEFAULT_PATH],
+                            help='Файлы с ингредиентами (.csv или .json)')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Сколько строк загружать за один раз')
 
     def handle(self, *args, **options):
-        for model, base in OUR_DATABASE.items():
-            path = f'{settings.BASE_DIR}/data/{base}'
-            with open(path, 'r', encoding='utf-8') as csv_file:
-                reader = csv.DictReader(csv_file)
-                model.objects.bulk_create(model(**data) for data in reader)
-            self.stdout.write(
-                self.style.SUCCESS(f'Модель {model.__name__} загружена')
-            )
+        for path in options['paths']:
+            try:
+                rows = read_rows(path)
+                with transaction.atomic():
+                    stats = import_ingredients(Ingredient, rows,
+                                               options['batch_size'])
+            except (OSError, ValueError) as error:
+                raise CommandError(error)
+            self.stdout.write(self.style.SUCCESS(
+                f'{path}: добавлено {stats["inserted"]}, '
+                f'пропущено {stats["skipped"]}, '
+                f'с ошибками {stats["invalid"]}'
+            ))
+        bump_catalog_version()
@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes.feed import rebuild
+from recipes.models import FeedEntry, Follow, Recipe
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает ленты подписок пользователей'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild(FeedEntry, Recipe, Follow, settings.FEED_BACKFILL_LIMIT)
+        self.stdout.write(self.style.SUCCESS('Ленты подписок перестроены'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes.counters import recount
+from recipes.models import Cart, Favourite, Follow, Recipe
+from user.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики избранного, покупок, рецептов и подписчиков'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recount(Recipe, CustomUser, Favourite, Cart, Follow)
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны'))
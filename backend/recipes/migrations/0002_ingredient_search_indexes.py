@@ -0,0 +1,40 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+CREATE_INDEXES = (
+    'CREATE INDEX IF NOT EXISTS ingredient_name_prefix '
+    'ON recipes_ingredient (LOWER(name) text_pattern_ops)',
+    'CREATE INDEX IF NOT EXISTS ingredient_name_trgm '
+    'ON recipes_ingredient USING gin (LOWER(name) gin_trgm_ops)',
+)
+DROP_INDEXES = (
+    'DROP INDEX IF EXISTS ingredient_name_prefix',
+    'DROP INDEX IF EXISTS ingredient_name_trgm',
+)
+
+
+def run_on_postgresql(schema_editor, statements):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_indexes(apps, schema_editor):
+    run_on_postgresql(schema_editor, CREATE_INDEXES)
+
+
+def drop_indexes(apps, schema_editor):
+    run_on_postgresql(schema_editor, DROP_INDEXES)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,49 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field
+        ).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    apps.get_model('recipes', 'Recipe').objects.update(
+        favourites_count=count_subquery(
+            apps.get_model('recipes', 'Favourite'), 'recipe'
+        ),
+        carts_count=count_subquery(apps.get_model('recipes', 'Cart'),
+                                   'recipe'),
+    )
+    apps.get_model('user', 'CustomUser').objects.update(
+        recipes_count=count_subquery(apps.get_model('recipes', 'Recipe'),
+                                     'author'),
+        followers_count=count_subquery(apps.get_model('recipes', 'Follow'),
+                                       'author'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0003_customuser_counters'),
+        ('recipes', '0002_ingredient_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='carts_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='В списках покупок'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favourites_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='В избранном'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
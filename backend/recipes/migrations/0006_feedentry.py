@@ -0,0 +1,71 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+import django.db.models.deletion
+
+
+def fill_feed(apps, schema_editor):
+    feed_model = apps.get_model('recipes', 'FeedEntry')
+    recipe_model = apps.get_model('recipes', 'Recipe')
+    followers = defaultdict(list)
+    for user_id, author_id in apps.get_model(
+            'recipes', 'Follow').objects.values_list('user_id', 'author_id'):
+        followers[author_id].append(user_id)
+    if not followers:
+        return
+    ranked = recipe_model.objects.filter(
+        author_id__in=list(followers)
+    ).annotate(
+        row_number=Window(
+            expression=RowNumber(),
+            partition_by=F('author_id'),
+            order_by=(F('pub_date').desc(), F('id').desc()),
+        )
+    ).order_by()
+    sql, params = ranked.query.sql_with_params()
+    feed_model.objects.bulk_create(
+        (feed_model(user_id=user_id, recipe_id=recipe.id,
+                    author_id=recipe.author_id, pub_date=recipe.pub_date)
+         for recipe in recipe_model.objects.raw(
+             f'SELECT * FROM ({sql}) ranked WHERE row_number <= %s',
+             (*params, settings.FEED_BACKFILL_LIMIT))
+         for user_id in followers[recipe.author_id]),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0005_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', '-pub_date'], name='feed_user_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', 'author'], name='feed_user_author_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_feed_entry'),
+        ),
+        migrations.RunPython(fill_feed, migrations.RunPython.noop),
+    ]
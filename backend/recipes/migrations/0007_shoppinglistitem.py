@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+import django.db.models.deletion
+
+
+def fill_shopping_lists(apps, schema_editor):
+    item_model = apps.get_model('recipes', 'ShoppingListItem')
+    totals = apps.get_model('recipes', 'Cart').objects.values(
+        'user_id', 'recipe__ingredients_in_recipe__ingredient_id'
+    ).annotate(
+        total=Sum('recipe__ingredients_in_recipe__amount')
+    ).filter(total__gt=0).order_by()
+    item_model.objects.bulk_create(
+        (item_model(
+            user_id=row['user_id'],
+            ingredient_id=row['recipe__ingredients_in_recipe__ingredient_id'],
+            amount=row['total'],
+        ) for row in totals.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0006_feedentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.IntegerField(verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglistitem',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_shopping_list_item'),
+        ),
+        migrations.RunPython(fill_shopping_lists, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+from django.db import migrations, models
+import django.db.models.expressions
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='recipe_author_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='favourite',
+            index=models.Index(fields=['recipe', 'user'], name='favourite_recipe_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(fields=['recipe', 'user'], name='cart_recipe_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['author', 'user'], name='follow_author_user_idx'),
+        ),
+        migrations.RemoveConstraint(
+            model_name='follow',
+            name='user_author',
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_user_author'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.CheckConstraint(check=models.Q(('user', django.db.models.expressions.F('author')), _negated=True), name='users_cannot_follow_themselves'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipe',
+            constraint=models.CheckConstraint(check=models.Q(('cooking_time__gte', 1)), name='recipe_cooking_time_positive'),
+        ),
+        migrations.AddConstraint(
+            model_name='ingredientsinrecipe',
+            constraint=models.CheckConstraint(check=models.Q(('amount__gte', 1)), name='ingredient_amount_positive'),
+        ),
+    ]
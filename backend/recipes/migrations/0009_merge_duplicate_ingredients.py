@@ -0,0 +1,39 @@
+from django.db import migrations
+from django.db.models import Count, Min, Sum
+
+
+def merge_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientsInRecipe = apps.get_model('recipes', 'IngredientsInRecipe')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(keep_id=Min('id'), total=Count('id')).filter(total__gt=1)
+    for duplicate in duplicates:
+        keep_id = duplicate['keep_id']
+        extra_ids = list(Ingredient.objects.filter(
+            name=duplicate['name'],
+            measurement_unit=duplicate['measurement_unit'],
+        ).exclude(id=keep_id).values_list('id', flat=True))
+        for model, owner in ((IngredientsInRecipe, 'recipe_id'),
+                             (ShoppingListItem, 'user_id')):
+            rows = model.objects.filter(
+                ingredient_id__in=extra_ids + [keep_id]
+            )
+            for total in rows.values(owner).annotate(amount=Sum('amount')):
+                model.objects.update_or_create(
+                    ingredient_id=keep_id, **{owner: total[owner]},
+                    defaults={'amount': total['amount']},
+                )
+        Ingredient.objects.filter(id__in=extra_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_query_indexes_and_constraints'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_ingredients, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,94 @@
+import django.contrib.postgres.search
+from django.contrib.postgres.aggregates import JSONBAgg, StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+CREATE_INDEXES = (
+    'CREATE INDEX IF NOT EXISTS recipe_search_vector_gin '
+    'ON recipes_recipe USING gin (search_vector)',
+    'CREATE INDEX IF NOT EXISTS recipe_ingredient_ids_gin '
+    'ON recipes_recipe USING gin (ingredient_ids jsonb_path_ops)',
+)
+DROP_INDEXES = (
+    'DROP INDEX IF EXISTS recipe_search_vector_gin',
+    'DROP INDEX IF EXISTS recipe_ingredient_ids_gin',
+)
+
+
+def run_on_postgresql(schema_editor, statements):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def aggregate_ingredients(IngredientsInRecipe, aggregate):
+    return Subquery(
+        IngredientsInRecipe.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            result=aggregate
+        ).values('result')
+    )
+
+
+def fill_search(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    IngredientsInRecipe = apps.get_model('recipes', 'IngredientsInRecipe')
+    if schema_editor.connection.vendor == 'postgresql':
+        names = aggregate_ingredients(IngredientsInRecipe,
+                                      StringAgg('ingredient__name', ' '))
+        Recipe.objects.update(
+            search_vector=(
+                SearchVector('name', weight='A', config='russian')
+                + SearchVector(names, weight='B', config='russian')
+                + SearchVector('text', weight='C', config='russian')
+            ),
+            ingredient_ids=Coalesce(
+                aggregate_ingredients(IngredientsInRecipe,
+                                      JSONBAgg('ingredient_id')),
+                Value([], output_field=models.JSONField()),
+            ),
+        )
+        return
+    ids = {}
+    for recipe_id, ingredient_id in IngredientsInRecipe.objects.order_by(
+            'ingredient_id').values_list('recipe_id', 'ingredient_id'):
+        ids.setdefault(recipe_id, []).append(ingredient_id)
+    Recipe.objects.bulk_update(
+        [Recipe(pk=recipe_id, ingredient_ids=ingredient_ids)
+         for recipe_id, ingredient_ids in ids.items()],
+        ['ingredient_ids'], batch_size=1000,
+    )
+
+
+def create_indexes(apps, schema_editor):
+    run_on_postgresql(schema_editor, CREATE_INDEXES)
+
+
+def drop_indexes(apps, schema_editor):
+    run_on_postgresql(schema_editor, DROP_INDEXES)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_unique_ingredient'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredient_ids',
+            field=models.JSONField(default=list, editable=False, verbose_name='Ингредиенты для поиска'),
+        ),
+        migrations.RunPython(fill_search, migrations.RunPython.noop),
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
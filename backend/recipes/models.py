@@ -1,6 +1,8 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.db.models.constraints import CheckConstraint, UniqueConstraint
+from foodgram.models import CounterFieldsMixin
 from user.models import CustomUser
 
 
@@ -18,11 +20,17 @@ class Ingredient(models.Model):
     measurement_unit = models.CharField(verbose_name='Система измерения',
                                         max_length=10)
 
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=['name', 'measurement_unit'],
+                             name='unique_ingredient'),
+        ]
+
     def __str__(self):
         return self.name
 
 
-class Recipe(models.Model):
+class Recipe(CounterFieldsMixin, models.Model):
     name = models.CharField(
         verbose_name='Название рецепта',
         max_length=200)
@@ -48,12 +56,39 @@ class Recipe(models.Model):
     image = models.ImageField(
         verbose_name='Картинка рецепта',
         upload_to='media/', blank=False, null=False)
+    image_variants = models.JSONField(
+        verbose_name='Варианты картинки',
+        default=dict, blank=True)
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True, editable=False)
+    ingredient_ids = models.JSONField(
+        verbose_name='Ингредиенты для поиска',
+        default=list, editable=False)
     pub_date = models.DateTimeField(
         verbose_name='Дата публикации',
         auto_now_add=True)
+    favourites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0)
+    carts_count = models.PositiveIntegerField(
+        verbose_name='В списках покупок',
+        default=0)
+
+    counter_fields = ('favourites_count', 'carts_count')
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='recipe_pub_date_id_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='recipe_author_pub_date_idx'),
+        ]
+        constraints = [
+            CheckConstraint(check=models.Q(cooking_time__gte=1),
+                            name='recipe_cooking_time_positive'),
+        ]
 
     def __str__(self):
         return self.name
@@ -74,9 +109,11 @@ class IngredientsInRecipe(models.Model):
     amount = models.IntegerField(verbose_name='Количество')
 
     class Meta:
-        constraints = [models.UniqueConstraint(
-            fields=['recipe', 'ingredient'],
-            name='recipe_ingredient')
+        constraints = [
+            models.UniqueConstraint(fields=['recipe', 'ingredient'],
+                                    name='recipe_ingredient'),
+            CheckConstraint(check=models.Q(amount__gte=1),
+                            name='ingredient_amount_positive'),
         ]
 
     def clean(self):
@@ -103,6 +140,8 @@ class Favourite(models.Model):
     class Meta:
         constraints = [UniqueConstraint(fields=['user', 'recipe'],
                                         name='unique_favourite')]
+        indexes = [models.Index(fields=['recipe', 'user'],
+                                name='favourite_recipe_user_idx')]
 
 
 class Follow(models.Model):
@@ -126,6 +165,37 @@ class Follow(models.Model):
             CheckConstraint(check=~models.Q(user=models.F('author')),
                             name='users_cannot_follow_themselves')
         ]
+        indexes = [models.Index(fields=['author', 'user'],
+                                name='follow_author_user_idx')]
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        verbose_name='Подписчик')
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт')
+    author = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор')
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        constraints = [UniqueConstraint(fields=['user', 'recipe'],
+                                        name='unique_feed_entry')]
+        indexes = [
+            models.Index(fields=['user', '-pub_date'],
+                         name='feed_user_pub_date_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='feed_user_author_idx'),
+        ]
 
 
 class Cart(models.Model):
@@ -137,3 +207,23 @@ class Cart(models.Model):
     class Meta:
         constraints = [UniqueConstraint(fields=['user', 'recipe'],
                                         name='unique_cart')]
+        indexes = [models.Index(fields=['recipe', 'user'],
+                                name='cart_recipe_user_idx')]
+
+
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь')
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Ингредиент')
+    amount = models.IntegerField(verbose_name='Количество')
+
+    class Meta:
+        constraints = [UniqueConstraint(fields=['user', 'ingredient'],
+                                        name='unique_shopping_list_item')]
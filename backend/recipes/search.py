@@ -0,0 +1,65 @@
+from django.contrib.postgres.aggregates import JSONBAgg, StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import connection
+from django.db.models import JSONField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+SEARCH_CONFIG = 'russian'
+
+
+def aggregate_ingredients(ingredients_model, aggregate):
+    return Subquery(
+        ingredients_model.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            result=aggregate
+        ).values('result')
+    )
+
+
+def ingredient_names(ingredients_model):
+    return aggregate_ingredients(ingredients_model,
+                                 StringAgg('ingredient__name', ' '))
+
+
+def ingredient_ids(ingredients_model):
+    return Coalesce(
+        aggregate_ingredients(ingredients_model, JSONBAgg('ingredient_id')),
+        Value([], output_field=JSONField()),
+    )
+
+
+def build_vector(ingredients_model):
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(ingredient_names(ingredients_model), weight='B',
+                       config=SEARCH_CONFIG)
+        + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search(recipe_model, ingredients_model, recipe_ids):
+    recipe_ids = set(recipe_ids)
+    if connection.vendor == 'postgresql':
+        recipe_model.objects.filter(pk__in=recipe_ids).update(
+            search_vector=build_vector(ingredients_model),
+            ingredient_ids=ingredient_ids(ingredients_model),
+        )
+        return
+    ids = {recipe_id: [] for recipe_id in recipe_ids}
+    for recipe_id, ingredient_id in ingredients_model.objects.filter(
+            recipe_id__in=recipe_ids
+    ).order_by('ingredient_id').values_list('recipe_id', 'ingredient_id'):
+        ids[recipe_id].append(ingredient_id)
+    recipe_model.objects.bulk_update(
+        [recipe_model(pk=recipe_id, ingredient_ids=ingredient_ids)
+         for recipe_id, ingredient_ids in ids.items()],
+        ['ingredient_ids'],
+    )
+
+
+def rebuild(recipe_model, ingredients_model, batch_size=1000):
+    recipe_ids = list(recipe_model.objects.values_list('pk', flat=True))
+    for start in range(0, len(recipe_ids), batch_size):
+        update_search(recipe_model, ingredients_model,
+                      recipe_ids[start:start + batch_size])
@@ -0,0 +1,84 @@
+from collections import defaultdict
+
+from django.db import connection
+from django.db.models import Sum
+
+BATCH_SIZE = 1000
+
+
+def recipe_amounts(ingredients_model, recipe_id, sign=1):
+    amounts = defaultdict(int)
+    for ingredient_id, amount in ingredients_model.objects.filter(
+            recipe_id=recipe_id).values_list('ingredient_id', 'amount'):
+        amounts[ingredient_id] += sign * amount
+    return amounts
+
+
+def apply_changes(item_model, user_ids, changes):
+    changes = {ingredient_id: delta
+               for ingredient_id, delta in changes.items() if delta}
+    user_ids = list(user_ids)
+    if not changes or not user_ids:
+        return
+    table = item_model._meta.db_table
+    rows = [(user_id, ingredient_id, delta)
+            for user_id in user_ids
+            for ingredient_id, delta in changes.items()]
+    # A single upsert, so concurrent cart changes of the same user add up
+    # instead of racing to insert the same (user, ingredient) row.
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), BATCH_SIZE):
+            batch = rows[start:start + BATCH_SIZE]
+            cursor.execute(
+                f'INSERT INTO {table} (user_id, ingredient_id, amount) '
+                f'VALUES {", ".join(["(%s, %s, %s)"] * len(batch))} '
+                f'ON CONFLICT (user_id, ingredient_id) DO UPDATE '
+                f'SET amount = {table}.amount + EXCLUDED.amount',
+                [value for row in batch for value in row],
+            )
+    if any(delta < 0 for delta in changes.values()):
+        item_model.objects.filter(
+            user_id__in=user_ids, ingredient_id__in=changes, amount__lte=0
+        ).delete()
+
+
+def expected_items(cart_model, user_ids=None):
+    carts = cart_model.objects.all()
+    if user_ids is not None:
+        carts = carts.filter(user_id__in=user_ids)
+    return carts.values(
+        'user_id', 'recipe__ingredients_in_recipe__ingredient_id'
+    ).annotate(
+        total=Sum('recipe__ingredients_in_recipe__amount')
+    ).filter(total__gt=0).order_by()
+
+
+def find_inconsistent(item_model, cart_model):
+    expected = {
+        (row['user_id'],
+         row['recipe__ingredients_in_recipe__ingredient_id']): row['total']
+        for row in expected_items(cart_model).iterator()
+    }
+    actual = {
+        (user_id, ingredient_id): amount
+        for user_id, ingredient_id, amount in item_model.objects.values_list(
+            'user_id', 'ingredient_id', 'amount'
+        ).iterator()
+    }
+    return {key[0] for key in expected.keys() | actual.keys()
+            if expected.get(key) != actual.get(key)}
+
+
+def rebuild(item_model, cart_model, user_ids=None):
+    items = item_model.objects.all()
+    if user_ids is not None:
+        items = items.filter(user_id__in=user_ids)
+    items.delete()
+    item_model.objects.bulk_create(
+        (item_model(
+            user_id=row['user_id'],
+            ingredient_id=row['recipe__ingredients_in_recipe__ingredient_id'],
+            amount=row['total'],
+        ) for row in expected_items(cart_model, user_ids).iterator()),
+        batch_size=BATCH_SIZE,
+    )
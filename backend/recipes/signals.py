@@ -0,0 +1,127 @@
+from weakref import WeakKeyDictionary
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from recipes import feed, search, shopping_list
+from recipes.counters import increment
+from recipes.images import (schedule_image_processing,
+                            schedule_variants_cleanup)
+from recipes.models import (Cart, Favourite, FeedEntry, Follow, Ingredient,
+                            IngredientsInRecipe, Recipe, ShoppingListItem)
+from user.models import CustomUser
+
+COUNTERS = {
+    Favourite: (Recipe, 'recipe_id', 'favourites_count'),
+    Cart: (Recipe, 'recipe_id', 'carts_count'),
+    Follow: (CustomUser, 'author_id', 'followers_count'),
+    Recipe: (CustomUser, 'author_id', 'recipes_count'),
+}
+
+
+@receiver(post_save, sender=Favourite)
+@receiver(post_save, sender=Cart)
+@receiver(post_save, sender=Follow)
+@receiver(post_save, sender=Recipe)
+def increment_counter(sender, instance, created, **kwargs):
+    if created:
+        model, key, field = COUNTERS[sender]
+        increment(model, getattr(instance, key), field, 1)
+
+
+@receiver(post_delete, sender=Favourite)
+@receiver(post_delete, sender=Cart)
+@receiver(post_delete, sender=Follow)
+@receiver(post_delete, sender=Recipe)
+def decrement_counter(sender, instance, **kwargs):
+    model, key, field = COUNTERS[sender]
+    increment(model, getattr(instance, key), field, -1)
+
+
+@receiver(post_save, sender=Recipe)
+def process_image(sender, instance, **kwargs):
+    schedule_image_processing(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_image_variants(sender, instance, **kwargs):
+    schedule_variants_cleanup(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(sender, instance, created, **kwargs):
+    if created:
+        feed.fan_out(FeedEntry, Follow, instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, **kwargs):
+    if created:
+        feed.backfill(FeedEntry, Recipe, instance.user_id,
+                      instance.author_id, settings.FEED_BACKFILL_LIMIT)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_feed(sender, instance, **kwargs):
+    feed.prune(FeedEntry, instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Cart)
+def add_to_shopping_list(sender, instance, created, **kwargs):
+    if created:
+        shopping_list.apply_changes(
+            ShoppingListItem, (instance.user_id,),
+            shopping_list.recipe_amounts(IngredientsInRecipe,
+                                         instance.recipe_id),
+        )
+
+
+@receiver(pre_delete, sender=Cart)
+def remove_from_shopping_list(sender, instance, **kwargs):
+    shopping_list.apply_changes(
+        ShoppingListItem, (instance.user_id,),
+        shopping_list.recipe_amounts(IngredientsInRecipe,
+                                     instance.recipe_id, sign=-1),
+    )
+
+
+pending_search = WeakKeyDictionary()
+
+
+def refresh_search(connection):
+    recipe_ids = pending_search.pop(connection, None)
+    if recipe_ids:
+        search.update_search(Recipe, IngredientsInRecipe, recipe_ids)
+
+
+def schedule_search_update(recipe_ids):
+    # Ids are collected per connection and the first callback to run after
+    # the commit refreshes all of them in one update; the others find
+    # nothing left. Every call still registers its own callback, so ids
+    # survive a rolled back savepoint that discarded an earlier one.
+    connection = transaction.get_connection()
+    pending_search.setdefault(connection, set()).update(recipe_ids)
+    transaction.on_commit(lambda: refresh_search(connection))
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search(sender, instance, **kwargs):
+    schedule_search_update([instance.pk])
+
+
+# Ingredient rows written through the serializer always come with a
+# Recipe save, so there is no post_delete receiver: it would disable the
+# fast cascade delete of a recipe's ingredients.
+@receiver(post_save, sender=IngredientsInRecipe)
+def update_ingredients_search(sender, instance, **kwargs):
+    schedule_search_update([instance.recipe_id])
+
+
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_search(sender, instance, created, **kwargs):
+    if not created:
+        schedule_search_update(list(IngredientsInRecipe.objects.filter(
+            ingredient=instance
+        ).values_list('recipe_id', flat=True)))
@@ -0,0 +1,59 @@
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+
+
+def placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def make_instances(model, user_id, rows):
+    return [model(id=pk, user_id=user_id, recipe_id=recipe_id)
+            for pk, recipe_id in rows]
+
+
+def add_recipes(model, user_id, recipe_ids):
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return []
+    table = model._meta.db_table
+    recipe_table = model._meta.get_field('recipe').related_model._meta.db_table
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (user_id, recipe_id) '
+                f'SELECT %s, id FROM {recipe_table} '
+                f'WHERE id IN ({placeholders(recipe_ids)}) '
+                f'ON CONFLICT (user_id, recipe_id) DO NOTHING '
+                f'RETURNING id, recipe_id',
+                [user_id, *recipe_ids],
+            )
+            instances = make_instances(model, user_id, cursor.fetchall())
+        for instance in instances:
+            post_save.send(sender=model, instance=instance, created=True,
+                           update_fields=None, raw=False,
+                           using=connection.alias)
+    return [instance.recipe_id for instance in instances]
+
+
+def remove_recipes(model, user_id, recipe_ids):
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return []
+    table = model._meta.db_table
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {table} WHERE user_id = %s '
+                f'AND recipe_id IN ({placeholders(recipe_ids)}) '
+                f'RETURNING id, recipe_id',
+                [user_id, *recipe_ids],
+            )
+            instances = make_instances(model, user_id, cursor.fetchall())
+        # Rows are only known after the DELETE, so pre_delete receivers
+        # run afterwards; none of them read the deleted row itself.
+        for instance in instances:
+            pre_delete.send(sender=model, instance=instance,
+                            using=connection.alias)
+            post_delete.send(sender=model, instance=instance,
+                             using=connection.alias)
+    return [instance.recipe_id for instance in instances]
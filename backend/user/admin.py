@@ -5,7 +5,9 @@ from .models import CustomUser
 
 class UserAdmin(admin.ModelAdmin):
     list_display = ('id', 'username', 'first_name',
-                    'last_name', 'email', 'role')
+                    'last_name', 'email', 'role', 'recipes_count',
+                    'followers_count')
+    readonly_fields = ('recipes_count', 'followers_count')
     search_fields = ('username', 'email')
     list_filter = ('username', 'email',)
     empty_value_display = '-пусто-'
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0002_alter_customuser_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Рецептов'),
+        ),
+    ]
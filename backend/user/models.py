@@ -2,6 +2,8 @@ from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.db import models
 
+from foodgram.models import CounterFieldsMixin
+
 USER = 'user'
 ADMIN = 'admin'
 SUPER_USER = 'super_user'
@@ -13,7 +15,7 @@ ROLES = (
 )
 
 
-class CustomUser(AbstractUser):
+class CustomUser(CounterFieldsMixin, AbstractUser):
     email = models.EmailField(max_length=254, unique=True, blank=False,
                               null=False)
     username = models.CharField(
@@ -24,7 +26,14 @@ class CustomUser(AbstractUser):
     first_name = models.CharField(max_length=150, blank=False, null=False)
     last_name = models.CharField(max_length=150, blank=False, null=False)
     password = models.CharField(max_length=150)
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Рецептов', default=0
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Подписчиков', default=0
+    )
 
+    counter_fields = ('recipes_count', 'followers_count')
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name', 'password']
 